@@ -2,6 +2,7 @@
 Diamond Classification and Grading System
 ML-based orientation detection using Random Forest classifier
 """
+import os
 import sys
 from pathlib import Path
 
@@ -10,11 +11,11 @@ sys.path.insert(0, str(project_root / 'src'))
 
 import cv2
 import numpy as np
-import joblib
-import json
-from preprocessing import SAMDiamondDetector
+from preprocessing import SAMDiamondDetector, load_image
 from classification import PureGeometricClassifier
 from grading import PickupGrader
+from core import (load_model, load_onnx_session, load_compiled_forest, predict_proba,
+                  make_feature_row_builder, save_json, VIS_JPEG_PARAMS)
 
 
 def classify_diamond(image_path: str, output_dir: str = None):
@@ -31,13 +32,16 @@ def classify_diamond(image_path: str, output_dir: str = None):
     # Load ML model
     model_file = project_root / 'models/ml_classifier/best_model_randomforest.pkl'
     feature_file = project_root / 'models/ml_classifier/feature_names.json'
+    onnx_file = project_root / 'models/ml_classifier/best_model_randomforest.onnx'
 
     if not model_file.exists():
         raise FileNotFoundError(f"ML model not found: {model_file}")
 
-    model = joblib.load(model_file)
-    with open(feature_file, 'r') as f:
-        feature_names = json.load(f)
+    model, feature_names = load_model(str(model_file), str(feature_file))
+    n_jobs = int(os.environ.get('RF_N_JOBS', -1))
+    onnx_session = load_onnx_session(str(onnx_file), max(0, n_jobs))
+    forest = load_compiled_forest(str(model_file), str(feature_file))
+    build_feature_row = make_feature_row_builder(tuple(feature_names))
 
     # Setup output directory
     if output_dir is None:
@@ -47,7 +51,7 @@ def classify_diamond(image_path: str, output_dir: str = None):
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Load image
-    image = cv2.imread(str(image_path))
+    image, image_scale = load_image(str(image_path))
     if image is None:
         raise ValueError(f"Could not load image: {image_path}")
 
@@ -56,8 +60,7 @@ def classify_diamond(image_path: str, output_dir: str = None):
     # Calculate area thresholds based on image size
     image_pixels = h * w
     base_pixels = 1944 * 2592
-    scale_factor = np.sqrt(image_pixels / base_pixels)
-    base_area_scale = scale_factor ** 2
+    base_area_scale = image_pixels / base_pixels
     min_area = max(30, int(200 * base_area_scale))
     max_area = max(1000, int(20000 * base_area_scale))
 
@@ -79,55 +82,56 @@ def classify_diamond(image_path: str, output_dir: str = None):
             'tilted_count': 0,
             'pickable_count': 0,
             'invalid_count': 0,
-            'classifications': []
+            'classifications': [],
+            'image_scale': image_scale
         }
 
-    # Extract features and classify
+    # Extract features for all diamonds, then classify them in one batch
     feature_extractor = PureGeometricClassifier()
-    table_count = 0
-    tilted_count = 0
-    classifications = []
+    X = np.empty((len(diamond_rois), len(feature_names)), dtype=np.float32, order='C')
+    diamond_types = [roi.detected_type if hasattr(roi, 'detected_type') else 'other'
+                     for roi in diamond_rois]
+
+    # Visit ROIs grouped by crop size so consecutive analyses touch similarly
+    # sized buffers; rows are written at the original index, so X and every
+    # downstream list stay in detection (roi.id) order
+    visit_order = sorted(range(len(diamond_rois)),
+                         key=lambda k: diamond_rois[k].roi_image.shape[0] * diamond_rois[k].roi_image.shape[1])
+
+    for i in visit_order:
+        roi = diamond_rois[i]
 
-    for roi in diamond_rois:
         # Extract geometric features
         result = feature_extractor.analyze(roi.contour, roi.mask, roi.roi_image)
 
-        diamond_type = roi.detected_type if hasattr(roi, 'detected_type') else 'other'
+        # Fill this diamond's feature row (column order matches feature_names.json)
+        X[i] = build_feature_row(result, diamond_types[i])
 
-        # Prepare features for ML model
-        features = [
-            result.outline_symmetry_score,
-            result.reflection_symmetry_score,
-            result.aspect_ratio,
-            result.spot_symmetry_score,
-            1 if result.has_large_central_spot else 0,
-            result.num_reflection_spots,
-            1 if diamond_type == 'emerald' else 0,
-            1 if diamond_type == 'other' else 0
-        ]
+    # Predict orientation for all diamonds at once
+    # predict() is argmax over predict_proba(), so derive labels instead of
+    # walking the trees a second time
+    probabilities = predict_proba(model, X, n_jobs, onnx_session, forest)
+    best = probabilities.argmax(axis=1)
+    predictions = model.classes_[best]
+    confidences = probabilities[np.arange(len(best)), best]
 
-        # Predict orientation
-        X = np.array([features])
-        prediction = model.predict(X)[0]
-        probability = model.predict_proba(X)[0]
+    table_count = int((predictions == 1).sum())
+    tilted_count = len(predictions) - table_count
 
-        orientation = 'table' if prediction == 1 else 'tilted'
-        confidence = probability[prediction]
+    # Plain Python str/float lists so the JSON encoder needs no numpy handling
+    orientations = np.where(predictions == 1, 'table', 'tilted').tolist()
+    confidence_values = confidences.tolist()
 
+    for roi, orientation, confidence in zip(diamond_rois, orientations, confidence_values):
         roi.orientation = orientation
         roi.ml_confidence = confidence
 
-        if orientation == 'table':
-            table_count += 1
-        else:
-            tilted_count += 1
-
-        classifications.append({
-            'roi_id': roi.id,
-            'diamond_type': diamond_type,
-            'orientation': orientation,
-            'confidence': float(confidence)
-        })
+    classifications = [
+        {'roi_id': roi.id, 'diamond_type': diamond_type,
+         'orientation': orientation, 'confidence': confidence}
+        for roi, diamond_type, orientation, confidence
+        in zip(diamond_rois, diamond_types, orientations, confidence_values)
+    ]
 
     # Grade diamonds
     grader = PickupGrader(check_orientation=True, image_width_px=w)
@@ -135,6 +139,7 @@ def classify_diamond(image_path: str, output_dir: str = None):
 
     pickable = [gd for gd in graded_diamonds if gd.grade is not None and gd.grade >= 0]
     invalid = [gd for gd in graded_diamonds if gd.grade == -1]
+    grades = np.fromiter((gd.grade for gd in pickable), dtype=np.float64, count=len(pickable))
 
     # Save results
     img_name = Path(image_path).stem
@@ -146,20 +151,20 @@ def classify_diamond(image_path: str, output_dir: str = None):
         'tilted_count': tilted_count,
         'pickable_count': len(pickable),
         'invalid_count': len(invalid),
-        'average_grade': sum(gd.grade for gd in pickable) / len(pickable) if len(pickable) > 0 else 0,
+        'average_grade': float(grades.mean()) if len(grades) > 0 else 0,
         'classifications': classifications,
         'model': 'RandomForest',
-        'model_accuracy': '95.6%'
+        'model_accuracy': '95.6%',
+        'image_scale': image_scale
     }
 
     json_file = output_dir / f'{img_name}.json'
-    with open(json_file, 'w') as f:
-        json.dump(json_output, f, indent=2)
+    save_json(json_file, json_output)
 
-    # Save visualization
-    vis_image = grader.visualize_pickup_order(image, graded_diamonds)
+    # Save visualization (the decoded image is not needed afterwards, so draw on it directly)
+    vis_image = grader.visualize_pickup_order(image, graded_diamonds, inplace=True)
     vis_file = output_dir / f'{img_name}.jpg'
-    cv2.imwrite(str(vis_file), vis_image)
+    cv2.imwrite(str(vis_file), vis_image, VIS_JPEG_PARAMS)
 
     return json_output
 
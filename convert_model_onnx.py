@@ -0,0 +1,63 @@
+"""
+Convert the trained RandomForest to ONNX for inference
+Classification uses the ONNX model automatically when onnxruntime is installed
+"""
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_root / 'src'))
+
+import joblib
+
+
+def convert_model_onnx(model_file: str = None, output_file: str = None):
+    """
+    Convert a scikit-learn model to ONNX
+
+    Args:
+        model_file: Path to trained ML model (default: models/ml_classifier/best_model_randomforest.pkl)
+        output_file: Output ONNX file (default: model path with .onnx suffix)
+    """
+    try:
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+    except ImportError:
+        print("ERROR: skl2onnx is required for conversion (pip install skl2onnx)")
+        return
+
+    if model_file is None:
+        model_file = project_root / 'models/ml_classifier/best_model_randomforest.pkl'
+
+    model_path = Path(model_file)
+    if not model_path.exists():
+        print(f"ERROR: ML model not found: {model_path}")
+        return
+
+    output_path = Path(output_file) if output_file else model_path.with_suffix('.onnx')
+
+    model = joblib.load(model_path)
+
+    # Disable ZipMap so probabilities come back as an (N, n_classes) array
+    onnx_model = convert_sklearn(
+        model,
+        initial_types=[('X', FloatTensorType([None, model.n_features_in_]))],
+        options={type(model): {'zipmap': False}}
+    )
+
+    with open(output_path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+
+    print(f"ONNX model saved to: {output_path}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert trained model to ONNX')
+    parser.add_argument('--model', type=str, help='Path to trained model (.pkl)')
+    parser.add_argument('--output', type=str, help='Output ONNX file (optional)')
+
+    args = parser.parse_args()
+
+    convert_model_onnx(args.model, args.output)
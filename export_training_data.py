@@ -9,11 +9,21 @@ project_root = Path(__file__).parent.absolute()
 sys.path.insert(0, str(project_root / 'src'))
 
 import cv2
-import json
 import numpy as np
 import pandas as pd
 
-from src.core import DiamondClassifier
+from src.core import DiamondClassifier, load_json
+
+# Diamond type -> (type_emerald, type_other) one-hot columns; 'round' is (0, 0)
+_TYPE_ONEHOT = {'emerald': (1, 0), 'other': (0, 1)}
+
+# Training CSV columns, in output order
+_COLUMNS = (
+    'image', 'roi_id',
+    'outline_sym', 'reflection_sym', 'aspect_ratio', 'spot_sym', 'has_spot', 'num_reflections',
+    'type_emerald', 'type_other',
+    'label', 'diamond_type', 'orientation'
+)
 
 
 def export_training_data(verifications_file: str, images_dir: str, output_file: str = None):
@@ -37,8 +47,7 @@ def export_training_data(verifications_file: str, images_dir: str, output_file:
         return
 
     # Load verifications
-    with open(verifications_path, 'r') as f:
-        verifications = json.load(f)
+    verifications = load_json(verifications_path)
 
     print("="*80)
     print("EXPORT TRAINING DATA")
@@ -58,8 +67,8 @@ def export_training_data(verifications_file: str, images_dir: str, output_file:
 
     classifier = DiamondClassifier(str(model_file), str(feature_file))
 
-    # Extract features for each verification
-    training_samples = []
+    # Extract features for each verification, collected column-wise
+    columns = {name: [] for name in _COLUMNS}
 
     # Group by image
     by_image = {}
@@ -107,31 +116,30 @@ def export_training_data(verifications_file: str, images_dir: str, output_file:
                 print(f"  WARNING: ROI {ver['roi_id']} not found in classifications")
                 continue
 
-            # Create training sample
-            sample = {
-                'image': img_name,
-                'roi_id': ver['roi_id'],
-                'outline_sym': classification.features['outline_sym'],
-                'reflection_sym': classification.features['reflection_sym'],
-                'aspect_ratio': classification.features['aspect_ratio'],
-                'spot_sym': classification.features['spot_sym'],
-                'has_spot': int(classification.features['has_spot']),
-                'num_reflections': classification.features['num_reflections'],
-                'type_emerald': 1 if ver['verified_type'] == 'emerald' else 0,
-                'type_other': 1 if ver['verified_type'] == 'other' else 0,
-                'label': 1 if ver['verified_orientation'] == 'table' else 0,  # 1=table, 0=tilted
-                'diamond_type': ver['verified_type'],
-                'orientation': ver['verified_orientation']
-            }
-
-            training_samples.append(sample)
-
-    if len(training_samples) == 0:
+            # Append training sample
+            features = classification.features
+            type_emerald, type_other = _TYPE_ONEHOT.get(ver['verified_type'], (0, 0))
+
+            columns['image'].append(img_name)
+            columns['roi_id'].append(ver['roi_id'])
+            columns['outline_sym'].append(features['outline_sym'])
+            columns['reflection_sym'].append(features['reflection_sym'])
+            columns['aspect_ratio'].append(features['aspect_ratio'])
+            columns['spot_sym'].append(features['spot_sym'])
+            columns['has_spot'].append(int(features['has_spot']))
+            columns['num_reflections'].append(features['num_reflections'])
+            columns['type_emerald'].append(type_emerald)
+            columns['type_other'].append(type_other)
+            columns['label'].append(int(ver['verified_orientation'] == 'table'))  # 1=table, 0=tilted
+            columns['diamond_type'].append(ver['verified_type'])
+            columns['orientation'].append(ver['verified_orientation'])
+
+    if len(columns['label']) == 0:
         print("ERROR: No training samples extracted")
         return
 
-    # Convert to DataFrame
-    df = pd.DataFrame(training_samples)
+    # Convert to DataFrame (one dtype inference per column)
+    df = pd.DataFrame(columns, copy=False)
 
     # Save to CSV
     if output_file is None:
@@ -146,7 +154,7 @@ def export_training_data(verifications_file: str, images_dir: str, output_file:
     print("="*80)
     print("EXPORT COMPLETE")
     print("="*80)
-    print(f"Training samples: {len(training_samples)}")
+    print(f"Training samples: {len(df)}")
     print()
     print("Label distribution:")
     print(f"  TABLE: {df['label'].sum()} ({100*df['label'].mean():.1f}%)")
@@ -8,20 +8,168 @@ from pathlib import Path
 project_root = Path(__file__).parent.absolute()
 sys.path.insert(0, str(project_root / 'src'))
 
+import os
+import multiprocessing
 import cv2
-import json
-from typing import List
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.util import Finalize
+from typing import List, Optional, Tuple
 
-from src.core import DiamondClassifier
+from src.core import DiamondClassifier, save_json, VIS_JPEG_PARAMS
+from preprocessing import load_image, find_images
 
 
-def process_batch(input_path: str, output_dir: str = None):
+# Rough resident memory of one worker (FastSAM-x at imgsz=1536 plus the
+# images and masks in flight), used to size the default worker count
+WORKER_MEMORY_BYTES = 3 * 1024**3
+
+# Cores given to each CPU worker by default; FastSAM's convolutions scale well
+# over a few threads, so a few multi-threaded workers beat one per core
+CORES_PER_WORKER = 4
+
+# Per-process classifier and output writer, created once by _init_worker
+_worker_classifier = None
+_worker_io = None
+
+
+def _init_worker(model_file: str, feature_file: str, threads: int):
+    """
+    Load a classifier and start an output writer in each worker process
+
+    Args:
+        threads: Compute threads for torch, OpenCV and Numba in this worker
+                 (the cores left to it by the other workers)
+    """
+    global _worker_classifier, _worker_io
+
+    # Every library's default pool uses all cores; capped here, N workers
+    # share the machine instead of running N x cores threads
+    import torch
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    try:
+        import numba
+        numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+    except ImportError:
+        pass
+
+    # The model pickle is uncompressed, so its arrays are memory-mapped from the
+    # shared page cache; single-threaded prediction and feature extraction
+    # avoid oversubscribing cores that the other workers are already using
+    _worker_classifier = DiamondClassifier(model_file, feature_file, n_jobs=1, mmap_mode='r',
+                                           feature_workers=1)
+
+    # JSON dumps and JPEG encodes run here so they overlap the next image's
+    # classification; _process_chunk waits for them before reporting back
+    _worker_io = ThreadPoolExecutor(max_workers=2)
+    Finalize(_worker_io, _worker_io.shutdown, kwargs={'wait': True}, exitpriority=10)
+
+
+def _cuda_available() -> bool:
+    """True when FastSAM will run on a CUDA device (the detector's default)"""
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def _default_workers(use_cuda: bool) -> int:
+    """
+    Worker processes for a default run
+
+    One with CUDA (each worker puts its own FastSAM on the GPU); otherwise one
+    per CORES_PER_WORKER cores, limited by how many WORKER_MEMORY_BYTES
+    workers fit in physical memory.
+    """
+    if use_cuda:
+        return 1
+
+    workers = max(1, (os.cpu_count() or 1) // CORES_PER_WORKER)
+    try:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return workers
+    return max(1, min(workers, memory // WORKER_MEMORY_BYTES))
+
+
+def _write_image(path: str, image: np.ndarray):
+    """cv2.imwrite that raises instead of returning False"""
+    if not cv2.imwrite(path, image, VIS_JPEG_PARAMS):
+        raise IOError(f"Could not write {path}")
+
+
+def _process_one(image_path: Path, images_dir: Path, json_dir: Path) -> Tuple[Optional[dict], list]:
+    """
+    Classify one image and queue its JSON and visualization for saving
+
+    Runs inside a worker process initialized by _init_worker.
+
+    Returns:
+        (stats, writes):
+        - stats: Per-image statistics, or None if the image could not be loaded
+        - writes: Futures of the queued output writes
+    """
+    # Load image
+    image, image_scale = load_image(str(image_path))
+    if image is None:
+        return None, []
+
+    # Classify
+    result = _worker_classifier.classify_image(image, image_path.name, image_scale)
+
+    # Save JSON
+    json_file = json_dir / f'{image_path.stem}.json'
+    writes = [_worker_io.submit(save_json, json_file, result.to_dict())]
+
+    # Save visualization (a fresh array, not reused by the next image)
+    vis_image = _worker_classifier.get_visualization()
+    if vis_image is not None:
+        vis_file = images_dir / f'{image_path.stem}.jpg'
+        writes.append(_worker_io.submit(_write_image, str(vis_file), vis_image))
+
+    stats = {
+        'image': image_path.name,
+        'diamonds': result.total_diamonds,
+        'table': result.table_count,
+        'tilted': result.tilted_count,
+        'pickable': result.pickable_count
+    }
+    return stats, writes
+
+
+def _process_chunk(image_paths: List[Path], images_dir: Path, json_dir: Path) -> List[Optional[dict]]:
+    """
+    Process a run of images in one worker, then wait for their output writes
+
+    Returns:
+        Per-image statistics (None if the image could not be loaded); an image
+        whose JSON or visualization could not be saved gets an 'error' entry
+    """
+    processed = [_process_one(image_path, images_dir, json_dir) for image_path in image_paths]
+
+    for stats, writes in processed:
+        for write in writes:
+            try:
+                write.result()
+            except Exception as e:
+                stats['error'] = f"{type(e).__name__}: {e}"
+                break
+
+    return [stats for stats, _ in processed]
+
+
+def process_batch(input_path: str, output_dir: str = None, workers: int = None):
     """
     Batch process images and save results
 
     Args:
         input_path: Path to image file or directory
         output_dir: Output directory (default: output/)
+        workers: Number of worker processes (default: see _default_workers;
+                 every worker loads its own FastSAM model, onto the GPU when
+                 CUDA is available). The CPU cores are split between them.
     """
     input_path = Path(input_path)
 
@@ -35,10 +183,7 @@ def process_batch(input_path: str, output_dir: str = None):
         dataset_name = input_path.stem
     elif input_path.is_dir():
         # Find all images in directory
-        image_extensions = ['.jp2', '.jpg', '.jpeg', '.png']
-        image_files = []
-        for ext in image_extensions:
-            image_files.extend(input_path.glob(f'*{ext}'))
+        image_files = find_images(input_path)
         dataset_name = input_path.name
     else:
         print(f"ERROR: Invalid path: {input_path}")
@@ -67,69 +212,74 @@ def process_batch(input_path: str, output_dir: str = None):
         print(f"ERROR: ML model not found: {model_file}")
         return
 
-    classifier = DiamondClassifier(str(model_file), str(feature_file))
+    # Workers inherit nothing CUDA-related from a spawned start, so a GPU
+    # probed here stays usable in the children
+    use_cuda = _cuda_available()
+    if workers is None:
+        workers = _default_workers(use_cuda)
+    workers = max(1, min(workers, len(image_files)))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    mp_context = multiprocessing.get_context('spawn') if use_cuda else None
 
     print("="*80)
     print("BATCH DIAMOND CLASSIFICATION AND GRADING")
     print("="*80)
     print(f"Input: {input_path}")
     print(f"Images: {len(image_files)}")
+    print(f"Workers: {workers}{' (CUDA)' if use_cuda else ''}, {threads_per_worker} threads each")
     print(f"Output images: {images_dir}")
     print(f"Output JSONs: {json_dir}")
     print("="*80)
     print()
 
-    # Process each image
-    total_images = 0
-    total_diamonds = 0
-    total_table = 0
-    total_tilted = 0
+    # Process images in parallel - each worker loads its own classifier and
+    # handles a run of images per task, so its output writes overlap the next
+    # image and are checked before the run is reported
     batch_results = []
+    failed_images = []
+
+    chunksize = max(1, len(image_files) // (4 * workers))
+    chunks = [image_files[start:start + chunksize] for start in range(0, len(image_files), chunksize)]
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(str(model_file), str(feature_file), threads_per_worker)) as executor:
+        chunk_stats = executor.map(
+            _process_chunk,
+            chunks,
+            [images_dir] * len(chunks),
+            [json_dir] * len(chunks)
+        )
+        stats_iter = (stats for chunk in chunk_stats for stats in chunk)
+
+        for img_idx, (image_path, stats) in enumerate(zip(image_files, stats_iter)):
+            print(f"Processed {img_idx + 1}/{len(image_files)}: {image_path.name}")
+
+            if stats is None:
+                print(f"  WARNING: Could not load {image_path.name}")
+                continue
+
+            if 'error' in stats:
+                print(f"  ERROR: Could not save results for {image_path.name}: {stats['error']}")
+                failed_images.append(image_path.name)
+                continue
+
+            batch_results.append(stats)
+
+            print(f"  Found {stats['diamonds']} diamonds (TABLE: {stats['table']}, TILTED: {stats['tilted']})")
 
-    for img_idx, image_path in enumerate(image_files):
-        print(f"Processing {img_idx + 1}/{len(image_files)}: {image_path.name}")
-
-        # Load image
-        image = cv2.imread(str(image_path))
-        if image is None:
-            print(f"  WARNING: Could not load {image_path.name}")
-            continue
-
-        # Classify
-        result = classifier.classify_image(image, image_path.name)
-
-        # Save JSON
-        json_file = json_dir / f'{image_path.stem}.json'
-        with open(json_file, 'w') as f:
-            json.dump(result.to_dict(), f, indent=2)
-
-        # Save visualization
-        vis_image = classifier.get_visualization()
-        if vis_image is not None:
-            vis_file = images_dir / f'{image_path.stem}.jpg'
-            cv2.imwrite(str(vis_file), vis_image)
-
-        # Update statistics
-        total_images += 1
-        total_diamonds += result.total_diamonds
-        total_table += result.table_count
-        total_tilted += result.tilted_count
-
-        batch_results.append({
-            'image': image_path.name,
-            'diamonds': result.total_diamonds,
-            'table': result.table_count,
-            'tilted': result.tilted_count,
-            'pickable': result.pickable_count
-        })
-
-        print(f"  Found {result.total_diamonds} diamonds (TABLE: {result.table_count}, TILTED: {result.tilted_count})")
+    # Aggregate statistics in one pass
+    counts = np.array([(r['diamonds'], r['table'], r['tilted']) for r in batch_results],
+                      dtype=np.int64).reshape(-1, 3)
+    total_images = len(batch_results)
+    total_diamonds, total_table, total_tilted = (int(c) for c in counts.sum(axis=0))
 
     print()
     print("="*80)
     print("BATCH PROCESSING COMPLETE")
     print("="*80)
     print(f"Images processed: {total_images}")
+    if failed_images:
+        print(f"Images failed to save: {len(failed_images)}")
     print(f"Total diamonds: {total_diamonds}")
     if total_diamonds > 0:
         print(f"  TABLE:  {total_table} ({100*total_table/total_diamonds:.1f}%)")
@@ -141,16 +291,16 @@ def process_batch(input_path: str, output_dir: str = None):
 
     # Save batch summary
     summary_file = json_dir / 'batch_summary.json'
-    with open(summary_file, 'w') as f:
-        json.dump({
-            'total_images': total_images,
-            'total_diamonds': total_diamonds,
-            'total_table': total_table,
-            'total_tilted': total_tilted,
-            'results': batch_results,
-            'model': 'RandomForest',
-            'model_accuracy': '95.6%'
-        }, f, indent=2)
+    save_json(summary_file, {
+        'total_images': total_images,
+        'total_diamonds': total_diamonds,
+        'total_table': total_table,
+        'total_tilted': total_tilted,
+        'failed_images': failed_images,
+        'results': batch_results,
+        'model': 'RandomForest',
+        'model_accuracy': '95.6%'
+    })
 
     print(f"Batch summary saved to: {summary_file}")
     print()
@@ -162,7 +312,11 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Batch diamond classification and grading')
     parser.add_argument('input', type=str, help='Path to image file or directory')
     parser.add_argument('--output-dir', type=str, help='Output directory (optional)')
+    parser.add_argument('--workers', type=int,
+                        help='Number of worker processes. Each loads its own FastSAM-x '
+                             '(about 3 GB) and gets CPU count / workers threads. Default: '
+                             f'1 with CUDA, else one per {CORES_PER_WORKER} cores, limited by memory')
 
     args = parser.parse_args()
 
-    process_batch(args.input, args.output_dir)
+    process_batch(args.input, args.output_dir, args.workers)
@@ -13,6 +13,11 @@ import numpy as np
 from typing import Tuple, List, Optional
 from dataclasses import dataclass
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 
 @dataclass
 class GeometricAnalysisResult:
@@ -38,6 +43,101 @@ class GeometricAnalysisResult:
     confidence: float                 # [0, 1] - confidence in decision
 
 
+# Branches of the hierarchical decision in PureGeometricClassifier._make_decision
+_BRANCH_WEIGHTED, _BRANCH_STRONG_TABLE, _BRANCH_STRONG_TILTED = 0, 1, 2
+
+
+def _build_decision_lut() -> np.ndarray:
+    """
+    Branch for every 6-bit pattern of primary-metric threshold tests
+
+    Bits 0-2: outline / reflection / aspect ratio reach their 'table' thresholds
+    Bits 3-5: outline / reflection / aspect ratio are below their 'weak' limits
+    """
+    lut = np.full(64, _BRANCH_WEIGHTED, dtype=np.uint8)
+    for key in range(64):
+        if key & 0b111 == 0b111:
+            lut[key] = _BRANCH_STRONG_TABLE
+        elif bin(key >> 3).count('1') >= 2:
+            lut[key] = _BRANCH_STRONG_TILTED
+    return lut
+
+
+_DECISION_LUT = _build_decision_lut()
+
+
+def _mirror_match_kernel(image, valid, half, use_valid):
+    """Count (matches, compared) of pixels against their mirror across column `half`"""
+    matches = 0
+    compared = 0
+    rows = image.shape[0]
+    mirror_base = 2 * half - 1
+
+    for r in range(rows):
+        for c in range(half):
+            m = mirror_base - c
+            if use_valid and valid[r, c] == 0:
+                continue
+            compared += 1
+            if image[r, c] == image[r, m]:
+                matches += 1
+
+    return matches, compared
+
+
+if njit is not None:
+    _mirror_match_kernel = njit(cache=True)(_mirror_match_kernel)
+
+
+def _mirror_valid_region(rotated_mask: np.ndarray) -> np.ndarray:
+    """
+    Left-half pixels whose mirror in the right half is also inside the diamond
+
+    Depends only on the rotated diamond mask, so it is built once per
+    analysis and shared by every mask compared in the rotated frame.
+
+    Returns:
+        (h, w // 2) bool array
+    """
+    half = rotated_mask.shape[1] // 2
+    left_mask = rotated_mask[:, :half]
+    right_mask_mirror = cv2.flip(rotated_mask[:, half:half + left_mask.shape[1]], 1)
+    return (left_mask > 127) & (right_mask_mirror > 127)
+
+
+def _mirror_match_counts(image: np.ndarray,
+                         valid: Optional[np.ndarray] = None) -> Tuple[int, int]:
+    """
+    Compare the left half of an axis-aligned image with the mirrored right half
+
+    Args:
+        image: Rotated binary image (symmetry axis vertical)
+        valid: Optional comparison region from _mirror_valid_region(); only
+               pixels inside the diamond on both sides are compared
+
+    Returns:
+        (matching_pixels, compared_pixels)
+    """
+    half = image.shape[1] // 2
+
+    if njit is not None:
+        # Fused compare + validity + count in one pass, no flipped copies
+        if valid is None:
+            return _mirror_match_kernel(image, image, half, False)
+        return _mirror_match_kernel(image, valid.view(np.uint8), half, True)
+
+    left = image[:, :half]
+    right_mirror = cv2.flip(image[:, half:half + left.shape[1]], 1)
+
+    if valid is None:
+        return int(np.count_nonzero(left == right_mirror)), left.size
+
+    # cv2.countNonZero is OpenCV's SIMD counter (uint8 view of the bool mask)
+    compared = cv2.countNonZero(valid.view(np.uint8))
+    matches = int(np.count_nonzero(left[valid] == right_mirror[valid]))
+    return matches, compared
+
+
 class PureGeometricClassifier:
     """
     Pure geometric classifier for emerald diamond orientation
@@ -45,11 +145,17 @@ class PureGeometricClassifier:
     Uses only geometric features - no CNN required.
     """
 
+    # Early-exit bounds on the aspect ratio (only used with enable_early_exit)
+    EARLY_EXIT_TILTED_ASPECT = 0.40     # below: decided 'tilted' from the outline alone
+    EARLY_EXIT_SKIP_SPOT_ASPECT = 0.92  # above: large-spot metric is skipped
+
     def __init__(self,
                  outline_sym_threshold: float = 0.70,
                  reflection_sym_threshold: float = 0.65,
                  spot_sym_threshold: float = 0.60,
-                 aspect_ratio_threshold: float = 0.58):
+                 aspect_ratio_threshold: float = 0.58,
+                 mask_interpolation: int = cv2.INTER_LINEAR,
+                 enable_early_exit: bool = False):
         """
         Initialize classifier
 
@@ -58,11 +164,32 @@ class PureGeometricClassifier:
             reflection_sym_threshold: Min reflection symmetry for 'table' (default 0.65)
             spot_sym_threshold: Min spot symmetry for 'table' (default 0.60)
             aspect_ratio_threshold: Min aspect ratio for 'table' (default 0.58)
+            mask_interpolation: cv2 interpolation flag for rotating binary masks.
+                                cv2.INTER_NEAREST reads one source pixel instead of
+                                four and keeps masks strictly 0/255, but shifts the
+                                features slightly - regenerate the training data
+                                (export_training_data.py) and retrain when switching.
+                                Default INTER_LINEAR matches the shipped model.
+            enable_early_exit: Decide strongly elongated outlines (aspect ratio
+                               < 0.40) as 'tilted' without the symmetry/spot
+                               metrics, and skip the spot metric for near-square
+                               ones (> 0.92). Speeds up classify_orientation(),
+                               but the skipped metrics are reported as 0, so keep
+                               it off when the metrics feed the RandomForest.
         """
         self.outline_sym_threshold = outline_sym_threshold
         self.reflection_sym_threshold = reflection_sym_threshold
         self.spot_sym_threshold = spot_sym_threshold
         self.aspect_ratio_threshold = aspect_ratio_threshold
+        self.mask_interpolation = mask_interpolation
+        self.enable_early_exit = enable_early_exit
+
+        # CLAHE for the large-spot metric, created once (apply() is stateless per image)
+        self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+
+        # Reusable warpAffine destinations, keyed by name and reallocated on size change (an
+        # instance should therefore not be shared between threads)
+        self._rotation_buffers = {}
 
         # Use existing symmetry detector for reliable measurements
         from classification.shape_based_symmetry import ShapeBasedSymmetryDetector
@@ -91,6 +218,54 @@ class PureGeometricClassifier:
 
         return result.orientation, result.confidence
 
+    def classify_batch(self, contours: List[np.ndarray], masks: List[np.ndarray],
+                       roi_images: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classify many diamonds, evaluating the decision logic once for all of them
+
+        Feature extraction still runs per diamond (OpenCV works on one image at
+        a time); the decision rules are applied to the stacked metrics in one
+        vectorized call.
+
+        Args:
+            contours: Diamond contours
+            masks: Binary mask per diamond
+            roi_images: ROI image per diamond (BGR)
+
+        Returns:
+            (orientations, confidences):
+            - orientations: array of 'table' / 'tilted'
+            - confidences: array of confidence scores (0-1)
+        """
+        n = len(contours)
+        outline_sym = np.zeros(n)
+        reflection_sym = np.zeros(n)
+        has_spot = np.zeros(n, dtype=bool)
+        spot_sym = np.zeros(n)
+        aspect_ratio = np.zeros(n)
+        valid = np.zeros(n, dtype=bool)
+
+        for i, (contour, mask, roi_image) in enumerate(zip(contours, masks, roi_images)):
+            # Same guard as classify_orientation()
+            if roi_image is None or mask is None or len(contour) < 5:
+                continue
+
+            metrics = self._compute_metrics(contour, mask, roi_image)
+            outline_sym[i] = metrics['outline_symmetry_score']
+            reflection_sym[i] = metrics['reflection_symmetry_score']
+            has_spot[i] = metrics['has_large_central_spot']
+            spot_sym[i] = metrics['spot_symmetry_score']
+            aspect_ratio[i] = metrics['aspect_ratio']
+            valid[i] = True
+
+        orientations, confidences = self._make_decision(
+            outline_sym, reflection_sym, has_spot, spot_sym, aspect_ratio
+        )
+        orientations[~valid] = 'tilted'
+        confidences[~valid] = 0.0
+
+        return orientations, confidences
+
     def analyze(self, contour: np.ndarray, mask: np.ndarray,
                 roi_image: np.ndarray) -> GeometricAnalysisResult:
         """
@@ -104,6 +279,41 @@ class PureGeometricClassifier:
         Returns:
             GeometricAnalysisResult with all metrics
         """
+        metrics = self._compute_metrics(contour, mask, roi_image)
+
+        # Decision logic (now using 4 metrics)
+        orientation, confidence = self._make_decision(
+            metrics['outline_symmetry_score'], metrics['reflection_symmetry_score'],
+            metrics['has_large_central_spot'], metrics['spot_symmetry_score'],
+            metrics['aspect_ratio']
+        )
+
+        return GeometricAnalysisResult(**metrics, orientation=orientation, confidence=confidence)
+
+    def _compute_metrics(self, contour: np.ndarray, mask: np.ndarray,
+                         roi_image: np.ndarray) -> dict:
+        """
+        Compute the four geometric metrics without making a decision
+
+        Returns:
+            Dict keyed by the GeometricAnalysisResult metric field names
+        """
+        # Metric 4 first: it only needs the contour, and with early exit
+        # enabled it can make the other metrics unnecessary
+        aspect_ratio = self._calculate_aspect_ratio(contour)
+
+        if self.enable_early_exit and aspect_ratio < self.EARLY_EXIT_TILTED_ASPECT:
+            return dict(
+                outline_symmetry_score=0.0,
+                outline_symmetry_axis=0.0,
+                reflection_symmetry_score=0.0,
+                num_reflection_spots=0,
+                has_large_central_spot=False,
+                spot_symmetry_score=0.0,
+                spot_is_light=False,
+                aspect_ratio=aspect_ratio
+            )
+
         # Convert to grayscale
         if len(roi_image.shape) == 3:
             gray = cv2.cvtColor(roi_image, cv2.COLOR_BGR2GRAY)
@@ -113,25 +323,60 @@ class PureGeometricClassifier:
         # Metric 1: Outline symmetry (using overall brightness pattern)
         outline_sym_score, outline_sym_axis = self._analyze_outline_symmetry(contour, mask, gray)
 
+        # Rotation that makes the symmetry axis vertical
+        # binaryImage moments give the pixel count as m00, reused as the diamond area
+        rotation_matrix = None
+        M = cv2.moments(mask, binaryImage=True)
+        total_area = M['m00']
+        if M['m00'] != 0:
+            center = (int(M['m10'] / M['m00']), int(M['m01'] / M['m00']))
+            rotation_matrix = cv2.getRotationMatrix2D(center, outline_sym_axis - 90, 1.0)
+
+        # Diamond bounding box (padded for the inner-reflection erosion);
+        # mask-local thresholding and labelling only need these pixels
+        crop = self._mask_crop(mask, pad=4)
+
+        # Build every mask compared in the rotated frame before rotating anything
+        # Metric 2 input: inner reflections (remove edge brightness)
+        bright_mask, num_spots = self._extract_inner_reflections(gray, mask, crop)
+
+        # Metric 3 input: largest light/dark spot
+        if self.enable_early_exit and aspect_ratio > self.EARLY_EXIT_SKIP_SPOT_ASPECT:
+            has_spot, spot_mask, spot_is_light = False, None, False
+        else:
+            has_spot, spot_mask, spot_is_light = self._analyze_large_spots(
+                gray, mask, crop, total_area
+            )
+
+        # Rotate the diamond, reflection and spot masks together (one
+        # multi-channel warp when all three are present); the mirrored comparison region derived from the
+        # rotated diamond mask is shared by both symmetry measurements
+        rotated_bright, rotated_spot, mirror_valid = None, None, None
+        if rotation_matrix is not None and (num_spots > 0 or has_spot):
+            planes = [mask]
+            if num_spots > 0:
+                planes.append(bright_mask)
+            if has_spot:
+                planes.append(spot_mask)
+
+            rotated = iter(self._rotate_planes_to_axis(planes, rotation_matrix))
+            mirror_valid = _mirror_valid_region(next(rotated))
+            if num_spots > 0:
+                rotated_bright = next(rotated)
+            if has_spot:
+                rotated_spot = next(rotated)
+
         # Metric 2: Inner reflection symmetry (along the outline symmetry axis)
         reflection_sym_score, num_spots = self._analyze_reflection_symmetry(
-            gray, mask, outline_sym_axis
-        )
-
-        # Metric 3: Large spot analysis
-        has_spot, spot_sym, spot_is_light = self._analyze_large_spots(
-            gray, mask, outline_sym_axis
+            rotated_bright, mirror_valid, num_spots
         )
 
-        # Metric 4: Aspect ratio
-        aspect_ratio = self._calculate_aspect_ratio(contour)
-
-        # Decision logic (now using 4 metrics)
-        orientation, confidence = self._make_decision(
-            outline_sym_score, reflection_sym_score, has_spot, spot_sym, aspect_ratio
-        )
+        # Metric 3: Large spot symmetry
+        spot_sym = 0.0
+        if has_spot:
+            spot_sym = self._measure_spot_symmetry(rotated_spot, mirror_valid)
 
-        return GeometricAnalysisResult(
+        return dict(
             outline_symmetry_score=outline_sym_score,
             outline_symmetry_axis=outline_sym_axis,
             reflection_symmetry_score=reflection_sym_score,
@@ -139,9 +384,7 @@ class PureGeometricClassifier:
             has_large_central_spot=has_spot,
             spot_symmetry_score=spot_sym,
             spot_is_light=spot_is_light,
-            aspect_ratio=aspect_ratio,
-            orientation=orientation,
-            confidence=confidence
+            aspect_ratio=aspect_ratio
         )
 
     def _analyze_outline_symmetry(self, contour: np.ndarray, mask: np.ndarray,
@@ -172,87 +415,176 @@ class PureGeometricClassifier:
 
         return best_sym, best_axis
 
+    @staticmethod
+    def _mask_crop(mask: np.ndarray, pad: int = 0) -> Tuple[slice, slice]:
+        """
+        Row/column slices of the mask's bounding box, grown by pad pixels
+
+        Pixels outside the box are zero in the mask, so any per-pixel or
+        connected-component step restricted to the mask gives the same result
+        on the crop as on the full ROI.
+        """
+        x, y, w, h = cv2.boundingRect(mask)
+        img_h, img_w = mask.shape[:2]
+        return (slice(max(y - pad, 0), min(y + h + pad, img_h)),
+                slice(max(x - pad, 0), min(x + w + pad, img_w)))
+
+    @staticmethod
+    def _masked_percentiles(image: np.ndarray, mask: np.ndarray,
+                            percentiles: Tuple[float, ...]) -> List[float]:
+        """
+        np.percentile (linear interpolation) of the image pixels inside mask
+
+        For uint8 images the order statistics are read from one masked
+        256-bin histogram (a single O(N) pass, no sort or copy of the pixels);
+        other dtypes fall back to one np.partition for all percentiles.
+        The mask must contain at least one pixel.
+        """
+        if image.dtype == np.uint8:
+            hist = cv2.calcHist([image], [0], mask, [256], [0, 256]).ravel()
+            cumulative = np.cumsum(hist)
+            n = int(cumulative[-1])
+
+            def order_stat(k):
+                # k-th smallest value (0-based): first bin whose cumulative count exceeds k
+                return float(np.searchsorted(cumulative, k, side='right'))
+        else:
+            values = image[mask > 0]
+            n = values.size
+            lows = [int(np.floor(p / 100.0 * (n - 1))) for p in percentiles]
+            kth = sorted({k for low in lows for k in (low, min(low + 1, n - 1))})
+            partitioned = np.partition(values, kth)
+
+            def order_stat(k):
+                return float(partitioned[k])
+
+        result = []
+        for p in percentiles:
+            pos = p / 100.0 * (n - 1)
+            low = int(np.floor(pos))
+            lower = order_stat(low)
+            upper = order_stat(min(low + 1, n - 1))
+            result.append(lower + (upper - lower) * (pos - low))
+
+        return result
+
+    def _rotate_to_axis(self, image: np.ndarray, rotation_matrix: np.ndarray,
+                        buffer: Optional[str] = None) -> np.ndarray:
+        """
+        Rotate an ROI-sized binary mask with the axis-alignment matrix (same output size)
+
+        Args:
+            buffer: Name of a per-instance destination buffer to warp into
+                    (reallocated only when the ROI size changes); the result
+                    stays valid until the next rotation using the same name
+        """
+        h, w = image.shape[:2]
+        if buffer is None:
+            return cv2.warpAffine(image, rotation_matrix, (w, h), flags=self.mask_interpolation)
+
+        dst = self._rotation_buffers.get(buffer)
+        if dst is None or dst.shape != image.shape or dst.dtype != image.dtype:
+            dst = np.empty(image.shape, dtype=image.dtype)
+            self._rotation_buffers[buffer] = dst
+
+        # Constant border: every destination pixel is written, nothing stale survives
+        return cv2.warpAffine(image, rotation_matrix, (w, h), dst=dst,
+                              flags=self.mask_interpolation)
+
+    def _rotate_planes_to_axis(self, planes: List[np.ndarray],
+                               rotation_matrix: np.ndarray) -> List[np.ndarray]:
+        """
+        Rotate several same-sized uint8 masks with the axis-alignment matrix
+
+        Three masks are stacked as channels of one image, so the source
+        coordinates are computed once for all of them. One or two masks are
+        warped separately: a 2-channel warp does not interpolate each channel
+        exactly like a single-channel warp on every OpenCV version.
+        """
+        if len(planes) <= 2:
+            return [self._rotate_to_axis(plane, rotation_matrix, f'plane{i}')
+                    for i, plane in enumerate(planes)]
+
+        stacked = cv2.merge(planes)
+        rotated = self._rotate_to_axis(stacked, rotation_matrix, f'planes{len(planes)}')
+        return list(cv2.split(rotated))
+
     def _measure_contour_symmetry(self, contour: np.ndarray, mask: np.ndarray,
-                                   axis_angle: float, center: Tuple[int, int]) -> float:
+                                   axis_angle: float, center: Tuple[int, int],
+                                   rotated_mask: Optional[np.ndarray] = None,
+                                   use_mask_as_contour: bool = True) -> float:
         """
         Measure how symmetric the contour is along an axis
 
         Strategy: Rotate so axis is vertical, compare left and right halves
-        """
-        h, w = mask.shape
 
-        # Create contour mask
-        contour_mask = np.zeros_like(mask)
-        cv2.drawContours(contour_mask, [contour], -1, 255, -1)
-
-        # Rotate so axis is vertical
-        rotation_matrix = cv2.getRotationMatrix2D(center, axis_angle - 90, 1.0)
-        rotated_mask = cv2.warpAffine(contour_mask, rotation_matrix, (w, h))
+        Args:
+            rotated_mask: Filled contour already rotated about center by
+                          axis_angle - 90 (skips drawing and rotating it again)
+            use_mask_as_contour: The mask is the filled contour (as produced by
+                                 the detector), so rotate it directly instead of
+                                 rasterizing the contour again. Set False if the
+                                 two can differ.
+        """
 
-        # Split in half vertically
-        left = rotated_mask[:, :w//2]
-        right = rotated_mask[:, w//2:w//2 + left.shape[1]]
+        if rotated_mask is None:
+            if use_mask_as_contour:
+                contour_mask = mask
+            else:
+                # Create contour mask
+                contour_mask = np.zeros_like(mask)
+                cv2.drawContours(contour_mask, [contour], -1, 255, -1)
 
-        # Mirror right half
-        right_mirror = cv2.flip(right, 1)
+            # Rotate so axis is vertical
+            rotation_matrix = cv2.getRotationMatrix2D(center, axis_angle - 90, 1.0)
+            rotated_mask = self._rotate_to_axis(contour_mask, rotation_matrix)
 
-        # Calculate overlap
+        # Split in half vertically, mirror the right half and calculate overlap
         # For binary masks: symmetric if pixels match
-        total_pixels = left.size
-        matching_pixels = np.sum(left == right_mirror)
+        matching_pixels, total_pixels = _mirror_match_counts(rotated_mask)
 
         symmetry = matching_pixels / total_pixels if total_pixels > 0 else 0.0
 
         return symmetry
 
-    def _analyze_reflection_symmetry(self, gray: np.ndarray, mask: np.ndarray,
-                                      axis_angle: float) -> Tuple[float, int]:
+    def _analyze_reflection_symmetry(self, rotated_bright: Optional[np.ndarray],
+                                      mirror_valid: Optional[np.ndarray],
+                                      num_spots: int) -> Tuple[float, int]:
         """
         Metric 2: Analyze inner reflection symmetry
 
-        Extract bright regions (reflections) and check if they're symmetric
-        along the outline symmetry axis.
+        Check if the bright regions (reflections) are symmetric along the
+        outline symmetry axis.
+
+        Args:
+            rotated_bright: Inner-reflection mask from _extract_inner_reflections(),
+                            rotated so the axis is vertical (None for an empty mask)
+            mirror_valid: Rotated-frame comparison region from _mirror_valid_region()
+            num_spots: Number of reflection spots in the mask
 
         Returns:
             (reflection_symmetry_score, num_reflection_spots)
         """
-        # Extract inner reflections (remove edge brightness)
-        bright_mask, num_spots = self._extract_inner_reflections(gray, mask)
-
         if num_spots == 0:
             return 0.0, 0
 
-        # Find center for rotation
-        M = cv2.moments(mask)
-        if M['m00'] == 0:
+        if rotated_bright is None:
             return 0.0, num_spots
 
-        cx = int(M['m10'] / M['m00'])
-        cy = int(M['m01'] / M['m00'])
-
         # Measure symmetry of reflections along axis
-        h, w = bright_mask.shape
-
-        # Rotate so axis is vertical
-        rotation_matrix = cv2.getRotationMatrix2D((cx, cy), axis_angle - 90, 1.0)
-        rotated_bright = cv2.warpAffine(bright_mask, rotation_matrix, (w, h))
-        rotated_mask = cv2.warpAffine(mask, rotation_matrix, (w, h))
+        h, w = rotated_bright.shape
 
         # Split in half
         left = rotated_bright[:, :w//2]
         right = rotated_bright[:, w//2:w//2 + left.shape[1]]
 
-        left_mask = rotated_mask[:, :w//2]
-        right_mask = rotated_mask[:, w//2:w//2 + left.shape[1]]
-
         # Mirror right
         right_mirror = cv2.flip(right, 1)
-        right_mask_mirror = cv2.flip(right_mask, 1)
 
-        # Valid comparison region
-        valid = (left_mask > 127) & (right_mask_mirror > 127)
+        # Valid comparison region (shared, from the rotated diamond mask)
+        valid = mirror_valid
 
-        if valid.sum() < 10:
+        if cv2.countNonZero(valid.view(np.uint8)) < 10:
             return 0.0, num_spots
 
         # Compare brightness similarity (not exact matching)
@@ -263,109 +595,110 @@ class PureGeometricClassifier:
         if len(left_pixels) < 2:
             return 0.0, num_spots
 
-        left_std = left_pixels.std()
-        right_std = right_pixels.std()
+        # Mean and (population) std of each side in a single pass
+        left_mean, left_std = (float(v[0, 0]) for v in cv2.meanStdDev(left_pixels))
+        right_mean, right_std = (float(v[0, 0]) for v in cv2.meanStdDev(right_pixels))
+        brightness_diff = abs(left_mean - right_mean) / 255.0
 
         # If std is too small (uniform region), use simple difference
         if left_std < 1e-6 or right_std < 1e-6:
             # Calculate simple brightness similarity
-            brightness_diff = np.abs(left_pixels.mean() - right_pixels.mean()) / 255.0
             symmetry = 1.0 - brightness_diff
             return np.clip(symmetry, 0.0, 1.0), num_spots
 
-        left_norm = (left_pixels - left_pixels.mean()) / (left_std + 1e-8)
-        right_norm = (right_pixels - right_pixels.mean()) / (right_std + 1e-8)
-
-        try:
-            correlation = np.corrcoef(left_norm, right_norm)[0, 1]
-            # Handle NaN from correlation
-            if np.isnan(correlation):
-                # Fallback to brightness similarity
-                brightness_diff = np.abs(left_pixels.mean() - right_pixels.mean()) / 255.0
-                correlation = 1.0 - 2.0 * brightness_diff  # Map to [-1, 1]
-        except:
-            # Fallback in case of error
-            brightness_diff = np.abs(left_pixels.mean() - right_pixels.mean()) / 255.0
-            correlation = 1.0 - 2.0 * brightness_diff
+        left_norm = (left_pixels - left_mean) / (left_std + 1e-8)
+        right_norm = (right_pixels - right_mean) / (right_std + 1e-8)
+
+        # Both sides are already zero-mean / unit-std, so Pearson correlation is
+        # just their mean product (one fused pass, accumulated in float64 like corrcoef)
+        correlation = np.einsum('i,i->', left_norm, right_norm, dtype=np.float64) / len(left_norm)
+        if np.isfinite(correlation):
+            correlation = float(np.clip(correlation, -1.0, 1.0))
+        else:
+            # Fallback to brightness similarity
+            correlation = 1.0 - 2.0 * brightness_diff  # Map to [-1, 1]
 
         # Map correlation to [0, 1]
         symmetry = (correlation + 1.0) / 2.0
 
         return np.clip(symmetry, 0.0, 1.0), num_spots
 
-    def _extract_inner_reflections(self, gray: np.ndarray,
-                                    mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    def _extract_inner_reflections(self, gray: np.ndarray, mask: np.ndarray,
+                                    crop: Tuple[slice, slice]) -> Tuple[np.ndarray, int]:
         """
         Extract bright regions inside the diamond (inner reflections)
 
         Remove edge highlights to focus only on internal facet reflections.
+        Thresholding, erosion and labelling run on the crop (padded by at
+        least the erosion reach) and the result is placed back in a full-size mask.
 
         Returns:
             (bright_mask, num_spots)
         """
-        # Apply mask
-        masked = gray.copy()
-        masked[mask == 0] = 0
-
-        # Get brightness threshold (top 20% brightest pixels)
-        masked_pixels = gray[mask > 0]
-        if len(masked_pixels) == 0:
+        # Get brightness threshold (top 20% brightest pixels of the whole diamond)
+        if cv2.countNonZero(mask[crop]) == 0:
             return np.zeros_like(gray, dtype=np.uint8), 0
 
-        threshold = np.percentile(masked_pixels, 80)
-
-        # Create bright region mask
-        bright_mask = np.zeros_like(gray, dtype=np.uint8)
-        bright_mask[(gray >= threshold) & (mask > 0)] = 255
+        threshold, = self._masked_percentiles(gray[crop], mask[crop], (80,))
 
         # Erode to remove edge brightness (CRITICAL for inner reflections only)
         kernel = np.ones((5, 5), np.uint8)
-        inner_mask = cv2.erode(mask, kernel, iterations=2)
-        bright_mask = cv2.bitwise_and(bright_mask, bright_mask, mask=inner_mask)
+        inner_mask = cv2.erode(mask[crop], kernel, iterations=2)
+
+        # Bright pixels inside the eroded mask in one compare + AND (the eroded
+        # mask lies within the diamond mask, so no separate mask test is needed;
+        # gray is integer, so >= threshold is >= ceil(threshold))
+        bright_mask = cv2.compare(gray[crop], float(np.ceil(threshold)), cv2.CMP_GE)
+        bright_mask = cv2.bitwise_and(bright_mask, inner_mask)
 
         # Count spots
         num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(bright_mask, connectivity=8)
 
-        # Filter small noise
-        clean_bright = np.zeros_like(bright_mask)
-        num_spots = 0
+        # Filter small noise (min 5 pixels) with a label -> 0/255 lookup table
+        keep = stats[:, cv2.CC_STAT_AREA] >= 5
+        keep[0] = False  # background
+        num_spots = int(np.count_nonzero(keep))
 
-        for i in range(1, num_labels):
-            area = stats[i, cv2.CC_STAT_AREA]
-            if area >= 5:  # Min 5 pixels
-                clean_bright[labels == i] = 255
-                num_spots += 1
+        clean_bright = np.zeros_like(gray, dtype=np.uint8)
+        clean_bright[crop] = (keep.astype(np.uint8) * 255)[labels]
 
         return clean_bright, num_spots
 
     def _analyze_large_spots(self, gray: np.ndarray, mask: np.ndarray,
-                             axis_angle: float) -> Tuple[bool, float, bool]:
+                             crop: Tuple[slice, slice],
+                             total_area: float) -> Tuple[bool, Optional[np.ndarray], bool]:
         """
         Metric 3: Analyze large light/dark spots
 
         TABLE diamonds often have a large central region (either bright or dark)
         that is well-segmented and symmetric. TILTED diamonds have irregular patterns.
+        Its symmetry is measured by _measure_spot_symmetry() once rotated.
+
+        Args:
+            total_area: Diamond area in pixels (mask moment m00)
 
         Returns:
-            (has_large_spot, spot_symmetry, is_light_spot)
+            (has_large_spot, spot_mask, is_light_spot)
         """
+        mask_c = mask[crop]
+
+        # Empty mask: nothing to threshold, skip CLAHE entirely
+        if cv2.countNonZero(mask_c) == 0:
+            return False, None, False
+
         # Apply CLAHE to normalize lighting
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        normalized = clahe.apply(gray)
+        normalized = self._clahe.apply(gray)
 
-        # Apply mask
-        masked = normalized.copy()
-        masked[mask == 0] = 0
+        # CLAHE needs the whole ROI (its tiles span the image); the spot
+        # thresholding and labelling below only need the diamond's box
+        normalized_c = normalized[crop]
 
-        # Threshold to find light regions
-        masked_pixels = normalized[mask > 0]
-        if len(masked_pixels) == 0:
-            return False, 0.0, False
+        # Both thresholds (light: top 30%, dark: bottom 30%) from one histogram
+        light_threshold, dark_threshold = self._masked_percentiles(normalized_c, mask_c, (70, 30))
 
         # Try bright spots first (top 30%)
-        light_threshold = np.percentile(masked_pixels, 70)
-        light_mask = np.zeros_like(gray, dtype=np.uint8)
-        light_mask[(normalized >= light_threshold) & (mask > 0)] = 255
+        light_mask = np.zeros_like(mask_c, dtype=np.uint8)
+        light_mask[(normalized_c >= light_threshold) & (mask_c > 0)] = 255
 
         # Find largest light component
         num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
@@ -384,34 +717,38 @@ class PureGeometricClassifier:
                 light_spot_area = areas[largest_idx - 1]
 
                 # Check if it's "large" (>15% of total area)
-                total_area = mask.sum() / 255
                 if light_spot_area > 0.15 * total_area:
                     large_light_spot = True
-                    light_spot_mask = (labels == largest_idx).astype(np.uint8) * 255
-
-        # Try dark spots (bottom 30%)
-        dark_threshold = np.percentile(masked_pixels, 30)
-        dark_mask = np.zeros_like(gray, dtype=np.uint8)
-        dark_mask[(normalized <= dark_threshold) & (mask > 0)] = 255
-
-        num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
-            dark_mask, connectivity=8
-        )
+                    light_spot_mask = self._component_mask(labels, largest_idx, mask.shape, crop)
 
         large_dark_spot = False
         dark_spot_mask = None
         dark_spot_area = 0
 
-        if num_labels > 1:
-            areas = stats[1:, cv2.CC_STAT_AREA]
-            if len(areas) > 0:
-                largest_idx = np.argmax(areas) + 1
-                dark_spot_area = areas[largest_idx - 1]
+        # When the light and dark pixel sets are disjoint, the dark spot holds at
+        # most the pixels the light spot left over; if the light spot already has
+        # at least half the diamond the dark spot cannot win below, so skip it
+        light_dominates = (large_light_spot and light_threshold > dark_threshold and
+                           2 * light_spot_area >= total_area)
+
+        if not light_dominates:
+            # Try dark spots (bottom 30%)
+            dark_mask = np.zeros_like(mask_c, dtype=np.uint8)
+            dark_mask[(normalized_c <= dark_threshold) & (mask_c > 0)] = 255
 
-                total_area = mask.sum() / 255
-                if dark_spot_area > 0.15 * total_area:
-                    large_dark_spot = True
-                    dark_spot_mask = (labels == largest_idx).astype(np.uint8) * 255
+            num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
+                dark_mask, connectivity=8
+            )
+
+            if num_labels > 1:
+                areas = stats[1:, cv2.CC_STAT_AREA]
+                if len(areas) > 0:
+                    largest_idx = np.argmax(areas) + 1
+                    dark_spot_area = areas[largest_idx - 1]
+
+                    if dark_spot_area > 0.15 * total_area:
+                        large_dark_spot = True
+                        dark_spot_mask = self._component_mask(labels, largest_idx, mask.shape, crop)
 
         # Pick the larger spot
         has_large_spot = False
@@ -427,48 +764,29 @@ class PureGeometricClassifier:
             spot_mask = dark_spot_mask
             is_light = False
 
-        # If we found a large spot, measure its symmetry
-        spot_symmetry = 0.0
-        if has_large_spot and spot_mask is not None:
-            spot_symmetry = self._measure_spot_symmetry(spot_mask, mask, axis_angle)
-
-        return has_large_spot, spot_symmetry, is_light
-
-    def _measure_spot_symmetry(self, spot_mask: np.ndarray, diamond_mask: np.ndarray,
-                                axis_angle: float) -> float:
-        """Measure how symmetric a spot is along an axis"""
-        # Find center
-        M = cv2.moments(diamond_mask)
-        if M['m00'] == 0:
-            return 0.0
-
-        cx = int(M['m10'] / M['m00'])
-        cy = int(M['m01'] / M['m00'])
-
-        # Rotate so axis is vertical
-        h, w = spot_mask.shape
-        rotation_matrix = cv2.getRotationMatrix2D((cx, cy), axis_angle - 90, 1.0)
-        rotated_spot = cv2.warpAffine(spot_mask, rotation_matrix, (w, h))
-        rotated_mask = cv2.warpAffine(diamond_mask, rotation_matrix, (w, h))
-
-        # Split and compare
-        left = rotated_spot[:, :w//2]
-        right = rotated_spot[:, w//2:w//2 + left.shape[1]]
+        return has_large_spot, spot_mask, is_light
 
-        left_mask = rotated_mask[:, :w//2]
-        right_mask = rotated_mask[:, w//2:w//2 + left.shape[1]]
+    @staticmethod
+    def _component_mask(labels: np.ndarray, label: int, shape: Tuple[int, int],
+                        crop: Tuple[slice, slice]) -> np.ndarray:
+        """Full-size 0/255 mask of one component from a label image computed on crop"""
+        component = np.zeros(shape, dtype=np.uint8)
 
-        right_mirror = cv2.flip(right, 1)
-        right_mask_mirror = cv2.flip(right_mask, 1)
+        # Single SIMD compare on the int32 label image that yields 0/255 directly
+        component[crop] = cv2.compare(labels, int(label), cv2.CMP_EQ)
 
-        valid = (left_mask > 127) & (right_mask_mirror > 127)
+        return component
 
-        if valid.sum() < 10:
+    def _measure_spot_symmetry(self, rotated_spot: Optional[np.ndarray],
+                                mirror_valid: Optional[np.ndarray]) -> float:
+        """Measure how symmetric a spot is along the axis (spot mask already rotated)"""
+        if rotated_spot is None:
             return 0.0
 
-        # Binary overlap
-        matching = (left[valid] == right_mirror[valid]).sum()
-        total = valid.sum()
+        # Split, mirror and compare inside the diamond on both sides (binary overlap)
+        matching, total = _mirror_match_counts(rotated_spot, mirror_valid)
+        if total < 10:
+            return 0.0
 
         return matching / total if total > 0 else 0.0
 
@@ -494,8 +812,7 @@ class PureGeometricClassifier:
 
         return aspect_ratio
 
-    def _make_decision(self, outline_sym: float, reflection_sym: float,
-                       has_spot: bool, spot_sym: float, aspect_ratio: float) -> Tuple[str, float]:
+    def _make_decision(self, outline_sym, reflection_sym, has_spot, spot_sym, aspect_ratio):
         """
         Make final decision based on four metrics
 
@@ -503,50 +820,66 @@ class PureGeometricClassifier:
         1. Primary: outline_sym + reflection_sym + aspect_ratio
         2. Secondary: spot analysis as tie-breaker
 
+        Accepts scalars (one diamond) or equal-length arrays (a batch); the
+        branches are evaluated as array masks so both cases share one code path.
+
         Returns:
-            (orientation, confidence)
+            (orientation, confidence) - str/float for scalar inputs,
+            arrays for array inputs
         """
+        scalar = np.ndim(outline_sym) == 0
+        outline_sym = np.asarray(outline_sym, dtype=np.float64)
+        reflection_sym = np.asarray(reflection_sym, dtype=np.float64)
+        has_spot = np.asarray(has_spot, dtype=bool)
+        spot_sym = np.asarray(spot_sym, dtype=np.float64)
+        aspect_ratio = np.asarray(aspect_ratio, dtype=np.float64)
+
+        primary_mean = (outline_sym + reflection_sym + aspect_ratio) / 3.0
+
+        # Pack the six primary-metric threshold tests into a bit key and look
+        # up which branch of the hierarchy applies (see _DECISION_LUT)
+        tests = (outline_sym >= self.outline_sym_threshold,
+                 reflection_sym >= self.reflection_sym_threshold,
+                 aspect_ratio >= self.aspect_ratio_threshold,
+                 outline_sym < 0.60,
+                 reflection_sym < 0.55,
+                 aspect_ratio < 0.52)
+        key = np.zeros(np.shape(outline_sym), dtype=np.uint8)
+        for bit, test in enumerate(tests):
+            key |= test.astype(np.uint8) << bit
+        branch = np.take(_DECISION_LUT, key)
+
         # Strong TABLE indicators (all 3 primary metrics high)
-        if (outline_sym >= self.outline_sym_threshold and
-            reflection_sym >= self.reflection_sym_threshold and
-            aspect_ratio >= self.aspect_ratio_threshold):
-            # All three primary metrics strong → TABLE (high confidence)
-            confidence = (outline_sym + reflection_sym + aspect_ratio) / 3.0
-            return 'table', confidence
+        strong_table = branch == _BRANCH_STRONG_TABLE
 
         # Strong TILTED indicators (2+ primary metrics weak)
-        weak_count = 0
-        if outline_sym < 0.60:
-            weak_count += 1
-        if reflection_sym < 0.55:
-            weak_count += 1
-        if aspect_ratio < 0.52:
-            weak_count += 1
-
-        if weak_count >= 2:
-            # Multiple weak metrics → TILTED (high confidence)
-            confidence = 1.0 - (outline_sym + reflection_sym + aspect_ratio) / 3.0
-            return 'tilted', confidence
+        strong_tilted = branch == _BRANCH_STRONG_TILTED
 
         # Mixed signals - use weighted combination
         # Aspect ratio has highest weight (strongest discriminator: 2.15 separation)
         primary_score = 0.25 * outline_sym + 0.35 * reflection_sym + 0.40 * aspect_ratio
 
-        # Use spot as tie-breaker if close to threshold
-        if abs(primary_score - 0.60) < 0.05:  # Close to decision boundary
-            if has_spot and spot_sym >= self.spot_sym_threshold:
-                # Spot pushes toward TABLE
-                final_score = 0.7 * primary_score + 0.3 * spot_sym
-            else:
-                final_score = primary_score
-        else:
-            final_score = primary_score
-
-        # Final decision
-        if final_score >= 0.60:
-            return 'table', final_score
-        else:
-            return 'tilted', 1.0 - final_score
+        # Use spot as tie-breaker if close to threshold (spot pushes toward TABLE)
+        near_boundary = np.abs(primary_score - 0.60) < 0.05
+        spot_boost = near_boundary & has_spot & (spot_sym >= self.spot_sym_threshold)
+        final_score = np.where(spot_boost, 0.7 * primary_score + 0.3 * spot_sym, primary_score)
+
+        is_table = np.where(strong_table, True,
+                            np.where(strong_tilted, False, final_score >= 0.60))
+        confidence = np.where(strong_table, primary_mean,
+                              np.where(strong_tilted, 1.0 - primary_mean,
+                                       np.where(is_table, final_score, 1.0 - final_score)))
+
+        # Early exit: strongly elongated outline is TILTED regardless of the other metrics
+        if self.enable_early_exit:
+            early_tilted = aspect_ratio < self.EARLY_EXIT_TILTED_ASPECT
+            is_table = is_table & ~early_tilted
+            confidence = np.where(early_tilted, 1.0 - aspect_ratio, confidence)
+        orientation = np.where(is_table, 'table', 'tilted')
+
+        if scalar:
+            return str(orientation), float(confidence)
+        return orientation, confidence
 
 
 def create_pure_geometric_classifier(outline_threshold: float = 0.70,
@@ -7,16 +7,258 @@ Key improvements:
 3. Mirror comparison along natural axis
 4. Focus on central table facet brightness
 """
+import math
 import cv2
 import numpy as np
 from dataclasses import dataclass
-from typing import Tuple, Optional
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple, Optional
 from scipy import ndimage
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _masked_moments_kernel(image, mask):
+    """Count, sum and sum of squares of image pixels where mask > 127"""
+    n = 0
+    total = 0
+    total_sq = 0
+    for r in range(image.shape[0]):
+        for c in range(image.shape[1]):
+            if mask[r, c] > 127:
+                v = int(image[r, c])
+                n += 1
+                total += v
+                total_sq += v * v
+    return n, total, total_sq
+
+
+def _mirror_moments_kernel(image, mask, half):
+    """
+    Raw moments of left-half pixels and their mirrors across column `half`,
+    over pixels where both the pixel and its mirror lie inside the mask
+    """
+    n = 0
+    left_sum = 0
+    right_sum = 0
+    left_sq = 0
+    right_sq = 0
+    cross = 0
+    mirror_base = 2 * half - 1
+    for r in range(image.shape[0]):
+        for c in range(half):
+            m = mirror_base - c
+            if mask[r, c] > 127 and mask[r, m] > 127:
+                lv = int(image[r, c])
+                rv = int(image[r, m])
+                n += 1
+                left_sum += lv
+                right_sum += rv
+                left_sq += lv * lv
+                right_sq += rv * rv
+                cross += lv * rv
+    return n, left_sum, right_sum, left_sq, right_sq, cross
+
+
+def _halves_sums_kernel(image, mask):
+    """(count, sum) of masked pixels in the left, right, top and bottom image halves"""
+    h, w = image.shape
+    half_h = h // 2
+    half_w = w // 2
+    n_left = n_right = n_top = n_bottom = 0
+    s_left = s_right = s_top = s_bottom = 0
+    for r in range(h):
+        for c in range(w):
+            if mask[r, c] > 127:
+                v = int(image[r, c])
+                if c < half_w:
+                    n_left += 1
+                    s_left += v
+                else:
+                    n_right += 1
+                    s_right += v
+                if r < half_h:
+                    n_top += 1
+                    s_top += v
+                else:
+                    n_bottom += 1
+                    s_bottom += v
+    return n_left, s_left, n_right, s_right, n_top, s_top, n_bottom, s_bottom
+
+
+if njit is not None:
+    # Integer accumulators keep the sums exact, so fastmath would gain nothing here
+    _masked_moments_kernel = njit(cache=True)(_masked_moments_kernel)
+    _mirror_moments_kernel = njit(cache=True)(_mirror_moments_kernel)
+    _halves_sums_kernel = njit(cache=True)(_halves_sums_kernel)
+
+
+def _masked_mean_std(image: np.ndarray, mask: np.ndarray,
+                     mask_is_binary: bool = False) -> Tuple[int, float, float]:
+    """
+    Count, mean and population std of the image pixels inside mask (> 127)
+
+    A mask that is already 0/255 (mask_is_binary) goes straight to OpenCV's
+    SIMD countNonZero / meanStdDev, with no thresholding pass and no gathered
+    pixels. Other masks use the fused numba kernel (exact integer moments)
+    when available, otherwise they are binarized once for OpenCV.
+
+    Returns:
+        (n, mean, std); mean and std are 0.0 for an empty mask
+    """
+    if not mask_is_binary:
+        if njit is not None:
+            n, total, total_sq = _masked_moments_kernel(image, mask)
+            if n == 0:
+                return 0, 0.0, 0.0
+            return n, total / n, float(np.sqrt((n * total_sq - total * total) / (n * n)))
+
+        mask = cv2.compare(mask, 127, cv2.CMP_GT)
+
+    n = cv2.countNonZero(mask)
+    if n == 0:
+        return 0, 0.0, 0.0
+    mean, std = cv2.meanStdDev(image, mask=mask)
+    return n, float(mean[0, 0]), float(std[0, 0])
+
+
+def _masked_percentile(image: np.ndarray, mask: np.ndarray, percentile: float) -> float:
+    """
+    np.percentile (linear interpolation) of the image pixels where mask is nonzero
+
+    uint8 images read the two order statistics from one masked 256-bin
+    histogram (calcHist + cumsum, no pixel copy or partial sort); other
+    dtypes gather the pixels for np.percentile. The mask must not be empty.
+    """
+    if image.dtype != np.uint8:
+        return float(np.percentile(image[mask > 0], percentile))
+
+    cumulative = np.cumsum(cv2.calcHist([image], [0], mask, [256], [0, 256]).ravel())
+    n = int(cumulative[-1])
+
+    pos = percentile / 100.0 * (n - 1)
+    low = int(np.floor(pos))
+    # k-th smallest value (0-based): first bin whose cumulative count exceeds k
+    lower = float(np.searchsorted(cumulative, low, side='right'))
+    upper = float(np.searchsorted(cumulative, min(low + 1, n - 1), side='right'))
+    return lower + (upper - lower) * (pos - low)
+
+
+def _mirror_moments(rotated_image: np.ndarray,
+                    rotated_mask: np.ndarray) -> Tuple[int, int, int, int, int, int]:
+    """
+    Raw moments for correlating the left half with the mirrored right half
+
+    Args:
+        rotated_image: Grayscale image rotated so the symmetry axis is vertical
+        rotated_mask: Mask rotated the same way
+
+    Returns:
+        (n, left_sum, right_sum, left_sq, right_sq, cross) over pixels valid on both sides
+    """
+    half = rotated_image.shape[1] // 2
+
+    if njit is not None:
+        # Reads each mirrored pair in place, no flipped copies or gathered pixels
+        return _mirror_moments_kernel(rotated_image, rotated_mask, half)
+
+    left = rotated_image[:, :half]
+    right_mirror = cv2.flip(rotated_image[:, half:half + left.shape[1]], 1)
+    left_mask = rotated_mask[:, :half]
+    right_mask_mirror = cv2.flip(rotated_mask[:, half:half + left.shape[1]], 1)
+
+    valid_mask = (left_mask > 127) & (right_mask_mirror > 127)
+    if cv2.countNonZero(valid_mask.view(np.uint8)) == 0:
+        return 0, 0, 0, 0, 0, 0
+    left_pixels = left[valid_mask].astype(np.int64)
+    right_pixels = right_mirror[valid_mask].astype(np.int64)
+
+    return (len(left_pixels), int(left_pixels.sum()), int(right_pixels.sum()),
+            int(np.dot(left_pixels, left_pixels)), int(np.dot(right_pixels, right_pixels)),
+            int(np.dot(left_pixels, right_pixels)))
+
+
+def _halves_means(image: np.ndarray, mask: np.ndarray,
+                  mask_is_binary: bool = False) -> Tuple[Tuple[int, float], ...]:
+    """
+    (count, mean) of masked pixels (> 127) in each image half; see _masked_mean_std()
+    for mask_is_binary
+
+    Returns:
+        ((n, mean) left, right, top, bottom); mean is 0.0 for an empty half
+    """
+    if njit is not None:
+        sums = _halves_sums_kernel(image, mask)
+        return tuple((n, total / n if n > 0 else 0.0) for n, total in zip(sums[::2], sums[1::2]))
+
+    # Binarize once, then let OpenCV's SIMD reductions count and average each half
+    # on views (cv2.mean treats any nonzero mask pixel as inside)
+    h, w = image.shape
+    binary = mask if mask_is_binary else cv2.compare(mask, 127, cv2.CMP_GT)
+    halves = []
+    for region, region_mask in ((image[:, :w//2], binary[:, :w//2]),
+                                (image[:, w//2:], binary[:, w//2:]),
+                                (image[:h//2, :], binary[:h//2, :]),
+                                (image[h//2:, :], binary[h//2:, :])):
+        n = cv2.countNonZero(region_mask)
+        halves.append((n, cv2.mean(region, mask=region_mask)[0] if n > 0 else 0.0))
+    return tuple(halves)
+
+
+@lru_cache(maxsize=16)
+def _ring_mask(h: int, w: int, inner_radius: int, outer_radius: int) -> np.ndarray:
+    """
+    Read-only 0/255 annulus around (w // 2, h // 2), cached by ROI shape and radii
+
+    Built from integer squared distances, which select exactly the pixels
+    the sqrt-distance comparison did (no sqrt, no float grid).
+    """
+    y_coords, x_coords = np.ogrid[:h, :w]
+    dist_sq = (y_coords - h // 2)**2 + (x_coords - w // 2)**2
+
+    ring = np.zeros((h, w), dtype=np.uint8)
+    ring[(dist_sq >= inner_radius**2) & (dist_sq <= outer_radius**2)] = 255
+    ring.flags.writeable = False
+    return ring
+
+
+def _axis_rotation(w: int, h: int, angle: float) -> np.ndarray:
+    """Rotation about (w // 2, h // 2) that turns an axis at `angle` degrees vertical"""
+    return cv2.getRotationMatrix2D((w // 2, h // 2), angle - 90, 1.0)
+
+
+@lru_cache(maxsize=16)
+def _multi_axis_rotations(w: int, h: int, num_angles: int) -> Dict[float, np.ndarray]:
+    """
+    Rotation matrices for the fixed multi-axis angles, cached by ROI shape
+
+    The matrices are read-only and shared; the dict must not be modified.
+    """
+    rotations = {}
+    for i in range(num_angles):
+        angle = i * 180.0 / num_angles
+        matrix = _axis_rotation(w, h, angle)
+        matrix.flags.writeable = False
+        rotations[angle] = matrix
+    return rotations
+
 
 @dataclass
 class ShapeSymmetryResult:
     """Result of shape-based symmetry analysis"""
+    # One result per ROI: slots drop the per-instance __dict__ (fields have no
+    # defaults, so explicit slots work with a plain dataclass on any Python 3)
+    __slots__ = (
+        'major_axis_angle', 'minor_axis_angle', 'symmetry_score_major', 'symmetry_score_minor',
+        'best_symmetry_score', 'table_brightness', 'brightness_uniformity',
+        'directional_gradient', 'num_bright_spots', 'axis_line_major', 'axis_line_minor',
+        'aspect_ratio', 'circularity', 'is_circular', 'ring_brightness',
+        'multi_axis_symmetry', 'num_symmetric_axes'
+    )
+
     major_axis_angle: float  # Angle of major axis (degrees)
     minor_axis_angle: float  # Angle of minor axis (degrees)
     symmetry_score_major: float  # Symmetry along major axis [0, 1]
@@ -52,35 +294,72 @@ class ShapeBasedSymmetryDetector:
         self,
         brightness_percentile: float = 70,  # Top 30% brightest pixels
         min_bright_area: int = 10,
-        max_bright_area: int = 1000
+        max_bright_area: int = 1000,
+        clahe_crop_to_mask: bool = False,
+        max_analysis_size: Optional[int] = None,
+        direct_fit_min_points: Optional[int] = None
     ):
         """
         Args:
             brightness_percentile: Percentile threshold for bright regions
             min_bright_area: Minimum area for valid bright spot
             max_bright_area: Maximum area for valid bright spot
+            clahe_crop_to_mask: Run CLAHE only on the mask bounding box instead of
+                                the whole ROI. Faster, but the CLAHE tiles change,
+                                so scores differ from those the model was trained on
+            max_analysis_size: If set (e.g. 256), ROIs whose longer side exceeds it are
+                               downsampled to it before analysis (INTER_AREA image,
+                               INTER_NEAREST mask). Off by default: scores then
+                               differ from the full-resolution training features
+            direct_fit_min_points: If set (e.g. 20), fit the ellipse straight to raw
+                                   contours with at least this many points, skipping
+                                   the polygon smoothing. Off by default: the fitted
+                                   axes then differ slightly from the trained ones
         """
         self.brightness_percentile = brightness_percentile
         self.min_bright_area = min_bright_area
         self.max_bright_area = max_bright_area
+        self.clahe_crop_to_mask = clahe_crop_to_mask
+        self.max_analysis_size = max_analysis_size
+        self.direct_fit_min_points = direct_fit_min_points
+
+        # CLAHE and the edge-erosion kernel are fixed, so build them once
+        # (CLAHE.apply() keeps no state between images)
+        self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        self._erode_kernel = np.ones((5, 5), np.uint8)
 
-    def smooth_contour(self, mask: np.ndarray) -> np.ndarray:
+    @staticmethod
+    def largest_contour(mask: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Largest external contour of a binary mask
+
+        Returns:
+            contour, or None if the mask is empty
+        """
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        if len(contours) == 0:
+            return None
+
+        return max(contours, key=cv2.contourArea)
+
+    def smooth_contour(self, mask: np.ndarray, contour: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Smooth contour using polygon approximation
 
         Args:
             mask: Binary mask
+            contour: Optional largest contour of mask, if already extracted
 
         Returns:
             smoothed_mask: Mask with smoothed contour
         """
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if contour is None:
+            # Get largest contour
+            contour = self.largest_contour(mask)
 
-        if len(contours) == 0:
-            return mask
-
-        # Get largest contour
-        contour = max(contours, key=cv2.contourArea)
+            if contour is None:
+                return mask
 
         # Smooth using polygon approximation
         epsilon = 0.01 * cv2.arcLength(contour, True)
@@ -95,7 +374,7 @@ class ShapeBasedSymmetryDetector:
     def fit_ellipse_to_shape(
         self,
         mask: np.ndarray
-    ) -> Optional[Tuple[Tuple[float, float], Tuple[float, float], float]]:
+    ) -> Tuple[Optional[Tuple[Tuple[float, float], Tuple[float, float], float]], Optional[np.ndarray]]:
         """
         Fit ellipse to smoothed mask to get natural axes
 
@@ -103,31 +382,77 @@ class ShapeBasedSymmetryDetector:
             mask: Binary mask
 
         Returns:
-            ellipse: ((cx, cy), (minor, major), angle) or None if fit fails
+            (ellipse, contour):
+            - ellipse: ((cx, cy), (minor, major), angle) or None if fit fails
+            - contour: Largest raw contour of mask (reusable for area/perimeter),
+                       or None if the mask is empty
         """
-        # Smooth contour first
-        smoothed_mask = self.smooth_contour(mask)
+        contour = self.largest_contour(mask)
 
-        contours, _ = cv2.findContours(smoothed_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if contour is None:
+            return None, None
 
-        if len(contours) == 0:
-            return None
+        if self.direct_fit_min_points is not None and len(contour) >= max(self.direct_fit_min_points, 5):
+            # Dense outline: fit it directly, without approxPolyDP + redraw + re-find
+            return cv2.fitEllipse(contour), contour
 
-        contour = max(contours, key=cv2.contourArea)
+        # Smooth contour first (re-using the raw contour instead of re-finding it)
+        smoothed_mask = self.smooth_contour(mask, contour)
 
-        if len(contour) < 5:
-            # Fallback: Try with original unsmoothed mask
-            contours_orig, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            if len(contours_orig) > 0:
-                contour_orig = max(contours_orig, key=cv2.contourArea)
-                if len(contour_orig) >= 5:
-                    ellipse = cv2.fitEllipse(contour_orig)
-                    return ellipse
-            return None
+        smoothed = self.largest_contour(smoothed_mask)
+
+        if smoothed is None:
+            return None, contour
+
+        if len(smoothed) < 5:
+            # Fallback: Try with original unsmoothed contour
+            if len(contour) >= 5:
+                ellipse = cv2.fitEllipse(contour)
+                return ellipse, contour
+            return None, contour
 
         # Fit ellipse
-        ellipse = cv2.fitEllipse(contour)
-        return ellipse
+        ellipse = cv2.fitEllipse(smoothed)
+        return ellipse, contour
+
+    @staticmethod
+    def _clip_axis_line(
+        cx: float,
+        cy: float,
+        dx: float,
+        dy: float,
+        w: int,
+        h: int
+    ) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        Clip the infinite line through (cx, cy) along (dx, dy) to the image (Liang-Barsky)
+
+        Returns:
+            (start, end) on the border of [0, w-1] x [0, h-1]; both equal the
+            rounded center if the line misses the image
+        """
+        t_enter, t_exit = -np.inf, np.inf
+
+        for origin, direction, upper in ((cx, dx, w - 1), (cy, dy, h - 1)):
+            if abs(direction) < 1e-12:
+                # Parallel to this pair of edges: inside their slab or nowhere
+                if origin < 0 or origin > upper:
+                    t_enter, t_exit = 0.0, -1.0
+                continue
+            t0 = -origin / direction
+            t1 = (upper - origin) / direction
+            if t0 > t1:
+                t0, t1 = t1, t0
+            t_enter = max(t_enter, t0)
+            t_exit = min(t_exit, t1)
+
+        if t_enter > t_exit:
+            center = (int(round(cx)), int(round(cy)))
+            return center, center
+
+        start = (int(round(cx + t_enter * dx)), int(round(cy + t_enter * dy)))
+        end = (int(round(cx + t_exit * dx)), int(round(cy + t_exit * dy)))
+        return start, end
 
     def get_axis_lines(
         self,
@@ -137,6 +462,9 @@ class ShapeBasedSymmetryDetector:
         """
         Get major and minor axis lines from fitted ellipse
 
+        Endpoints are where each axis crosses the image border, so the lines can
+        be drawn without further clipping.
+
         Args:
             ellipse: ((cx, cy), (width, height), angle)
             image_shape: (height, width)
@@ -146,28 +474,16 @@ class ShapeBasedSymmetryDetector:
         """
         (cx, cy), (width, height), angle = ellipse
 
-        h, w = image_shape
+        h, w = image_shape[:2]
 
-        # Major axis is along the ellipse angle
+        # Major axis is along the ellipse angle, minor axis perpendicular to it
         major_angle_rad = np.deg2rad(angle)
-        minor_angle_rad = np.deg2rad(angle + 90)
+        dx, dy = np.cos(major_angle_rad), np.sin(major_angle_rad)
 
-        # Use image diagonal as line length
-        length = int(np.sqrt(h**2 + w**2))
+        major_line = self._clip_axis_line(cx, cy, dx, dy, w, h)
+        minor_line = self._clip_axis_line(cx, cy, -dy, dx, w, h)
 
-        # Major axis
-        major_dx = int(length * np.cos(major_angle_rad))
-        major_dy = int(length * np.sin(major_angle_rad))
-        major_start = (int(cx - major_dx), int(cy - major_dy))
-        major_end = (int(cx + major_dx), int(cy + major_dy))
-
-        # Minor axis (perpendicular)
-        minor_dx = int(length * np.cos(minor_angle_rad))
-        minor_dy = int(length * np.sin(minor_angle_rad))
-        minor_start = (int(cx - minor_dx), int(cy - minor_dy))
-        minor_end = (int(cx + minor_dx), int(cy + minor_dy))
-
-        return (major_start, major_end), (minor_start, minor_end)
+        return major_line, minor_line
 
     def extract_bright_regions(
         self,
@@ -185,37 +501,30 @@ class ShapeBasedSymmetryDetector:
             bright_mask: Binary mask of bright regions
             num_spots: Number of distinct bright spots
         """
-        # Apply mask to focus on diamond interior
-        masked_image = roi_image.copy()
-        masked_image[mask == 0] = 0
-
         # Get brightness threshold (top X% brightest pixels)
-        masked_pixels = roi_image[mask > 0]
-        if len(masked_pixels) == 0:
+        if cv2.countNonZero(mask) == 0:
             return np.zeros_like(roi_image), 0
 
-        threshold = np.percentile(masked_pixels, self.brightness_percentile)
+        threshold = _masked_percentile(roi_image, mask, self.brightness_percentile)
 
         # Create bright region mask
         bright_mask = np.zeros_like(roi_image, dtype=np.uint8)
         bright_mask[(roi_image >= threshold) & (mask > 0)] = 255
 
         # Erode to remove outer edge brightness
-        kernel = np.ones((5, 5), np.uint8)
-        inner_mask = cv2.erode(mask, kernel, iterations=2)
+        inner_mask = cv2.erode(mask, self._erode_kernel, iterations=2)
         bright_mask = cv2.bitwise_and(bright_mask, bright_mask, mask=inner_mask)
 
-        # Filter by size
+        # Filter by size with a label -> 0/255 lookup table (one gather instead of
+        # one full-image comparison per component)
         num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(bright_mask, connectivity=8)
 
-        clean_bright_mask = np.zeros_like(bright_mask)
-        num_spots = 0
+        areas = stats[:, cv2.CC_STAT_AREA]
+        keep = (areas >= self.min_bright_area) & (areas <= self.max_bright_area)
+        keep[0] = False  # background
+        num_spots = int(np.count_nonzero(keep))
 
-        for label_id in range(1, num_labels):
-            area = stats[label_id, cv2.CC_STAT_AREA]
-            if self.min_bright_area <= area <= self.max_bright_area:
-                clean_bright_mask[labels == label_id] = 255
-                num_spots += 1
+        clean_bright_mask = (keep.astype(np.uint8) * 255)[labels]
 
         return clean_bright_mask, num_spots
 
@@ -223,7 +532,10 @@ class ShapeBasedSymmetryDetector:
         self,
         roi_image: np.ndarray,
         mask: np.ndarray,
-        angle: float
+        angle: float,
+        dst_img: Optional[np.ndarray] = None,
+        dst_mask: Optional[np.ndarray] = None,
+        rotation_matrix: Optional[np.ndarray] = None
     ) -> float:
         """
         Compute symmetry by mirroring image along axis and comparing brightness
@@ -232,54 +544,53 @@ class ShapeBasedSymmetryDetector:
             roi_image: Grayscale ROI
             mask: Binary mask
             angle: Axis angle in degrees
+            dst_img: Optional (h, w) uint8 buffer reused for the rotated image
+            dst_mask: Optional (h, w) uint8 buffer reused for the rotated mask
+            rotation_matrix: Optional precomputed _axis_rotation() for this angle
 
         Returns:
             symmetry_score: Correlation between original and mirrored [0, 1]
         """
         h, w = roi_image.shape
-        center = (w // 2, h // 2)
 
         # Rotate image so axis is vertical (easier to split/mirror)
-        rotation_matrix = cv2.getRotationMatrix2D(center, angle - 90, 1.0)
-        rotated_image = cv2.warpAffine(roi_image, rotation_matrix, (w, h))
-        rotated_mask = cv2.warpAffine(mask, rotation_matrix, (w, h))
-
-        # Split in half vertically
-        left = rotated_image[:, :w//2]
-        right = rotated_image[:, w//2:w//2 + left.shape[1]]  # Match size
-
-        left_mask = rotated_mask[:, :w//2]
-        right_mask = rotated_mask[:, w//2:w//2 + left.shape[1]]
-
-        # Mirror right half
-        right_mirror = cv2.flip(right, 1)
-        right_mask_mirror = cv2.flip(right_mask, 1)
-
-        # Compare only where both sides have valid mask
-        valid_mask = (left_mask > 127) & (right_mask_mirror > 127)
-
-        if valid_mask.sum() < 10:  # Need at least 10 pixels
-            return 0.0
-
-        left_pixels = left[valid_mask].astype(np.float32)
-        right_pixels = right_mirror[valid_mask].astype(np.float32)
+        if rotation_matrix is None:
+            rotation_matrix = _axis_rotation(w, h, angle)
+        # One warp per plane: a 2-channel warp does not interpolate each
+        # channel exactly like a single-channel warp on every OpenCV version
+        rotated_image = cv2.warpAffine(roi_image, rotation_matrix, (w, h), dst=dst_img)
+        rotated_mask = cv2.warpAffine(mask, rotation_matrix, (w, h), dst=dst_mask)
+
+        # Compare the left half with the mirrored right half, only where both
+        # sides have valid mask
+        n, left_sum, right_sum, left_sq, right_sq, cross = _mirror_moments(
+            rotated_image, rotated_mask
+        )
 
-        # Compute correlation
-        if len(left_pixels) < 2:
+        if n < 10:  # Need at least 10 pixels
             return 0.0
 
-        # Normalize to [0, 1]
-        left_norm = (left_pixels - left_pixels.mean()) / (left_pixels.std() + 1e-8)
-        right_norm = (right_pixels - right_pixels.mean()) / (right_pixels.std() + 1e-8)
-
-        correlation = np.corrcoef(left_norm, right_norm)[0, 1]
+        # Single-pass Pearson correlation from raw moments; covariance and variances
+        # are kept scaled by n*n so they stay exact integers (the scale cancels)
+        cov = n * cross - left_sum * right_sum
+        left_var = n * left_sq - left_sum * left_sum
+        right_var = n * right_sq - right_sum * right_sum
+
+        # The scaled variances are exact but unbounded Python ints; their product
+        # outgrows what np.sqrt accepts for large ROIs, so take roots in float
+        denom = math.sqrt(float(left_var)) * math.sqrt(float(right_var))
+        if denom > 0:
+            correlation = float(np.clip(cov / denom, -1.0, 1.0))
+        else:
+            # Constant side: undefined, as np.corrcoef reports it
+            correlation = np.nan
 
         # Map correlation [-1, 1] to symmetry score [0, 1]
         # High positive correlation = symmetric
         symmetry = (correlation + 1.0) / 2.0
 
         # Also check brightness difference (should be small for symmetric)
-        brightness_diff = np.abs(left_pixels.mean() - right_pixels.mean()) / 255.0
+        brightness_diff = abs(left_sum - right_sum) / n / 255.0
         brightness_similarity = 1.0 - brightness_diff
 
         # Combine correlation and brightness similarity
@@ -287,11 +598,60 @@ class ShapeBasedSymmetryDetector:
 
         return np.clip(final_score, 0.0, 1.0)
 
+    def compute_axis_symmetries(
+        self,
+        roi_image: np.ndarray,
+        mask: np.ndarray,
+        angles: Iterable[float],
+        dst_img: Optional[np.ndarray] = None,
+        dst_mask: Optional[np.ndarray] = None,
+        rotations: Optional[Dict[float, np.ndarray]] = None
+    ) -> Dict[float, float]:
+        """
+        Mirror symmetry for each distinct axis angle, warping once per angle
+
+        Args:
+            roi_image: Grayscale ROI
+            mask: Binary mask
+            angles: Axis angles in degrees (repeated angles are computed once)
+            dst_img: Optional (h, w) uint8 buffer reused for every rotated image
+            dst_mask: Optional (h, w) uint8 buffer reused for every rotated mask
+            rotations: Optional precomputed {angle: rotation matrix}, e.g. from
+                       multi_axis_rotations(); other angles build their own
+
+        Returns:
+            scores: {angle: symmetry_score}
+        """
+        if rotations is None:
+            rotations = {}
+
+        scores = {}
+        for angle in angles:
+            if angle not in scores:
+                scores[angle] = self.compute_mirror_symmetry(
+                    roi_image, mask, angle, dst_img=dst_img, dst_mask=dst_mask,
+                    rotation_matrix=rotations.get(angle)
+                )
+        return scores
+
+    @staticmethod
+    def multi_axis_angles(num_angles: int = 8) -> list:
+        """Evenly spaced axis angles in [0, 180) used by the multi-axis symmetry test"""
+        return [i * 180.0 / num_angles for i in range(num_angles)]
+
+    @staticmethod
+    def multi_axis_rotations(image_shape: Tuple[int, int],
+                             num_angles: int = 8) -> Dict[float, np.ndarray]:
+        """Cached rotation matrices for multi_axis_angles() on an ROI of image_shape (h, w)"""
+        h, w = image_shape[:2]
+        return _multi_axis_rotations(w, h, num_angles)
+
     def compute_central_brightness(
         self,
         roi_image: np.ndarray,
         mask: np.ndarray,
-        radius_fraction: float = 0.2
+        radius_fraction: float = 0.2,
+        mask_is_binary: bool = False
     ) -> float:
         """
         Measure brightness in central region (table facet indicator)
@@ -300,6 +660,7 @@ class ShapeBasedSymmetryDetector:
             roi_image: Grayscale ROI
             mask: Binary mask
             radius_fraction: Fraction of image size for central region
+            mask_is_binary: mask is already 0/255 (e.g. from cv2.compare), skip re-thresholding
 
         Returns:
             central_brightness: Normalized brightness [0, 1]
@@ -316,20 +677,18 @@ class ShapeBasedSymmetryDetector:
         central_region = roi_image[y1:y2, x1:x2]
         central_mask = mask[y1:y2, x1:x2]
 
-        if central_mask.sum() == 0:
-            return 0.0
-
-        central_pixels = central_region[central_mask > 127]
+        n, mean, _ = _masked_mean_std(central_region, central_mask, mask_is_binary)
 
-        if len(central_pixels) == 0:
+        if n == 0:
             return 0.0
 
-        return central_pixels.mean() / 255.0
+        return mean / 255.0
 
     def compute_brightness_uniformity(
         self,
         roi_image: np.ndarray,
-        mask: np.ndarray
+        mask: np.ndarray,
+        mask_is_binary: bool = False
     ) -> float:
         """
         Measure how uniform the brightness is (table-up = more uniform)
@@ -337,18 +696,17 @@ class ShapeBasedSymmetryDetector:
         Args:
             roi_image: Grayscale ROI
             mask: Binary mask
+            mask_is_binary: mask is already 0/255 (e.g. from cv2.compare), skip re-thresholding
 
         Returns:
             uniformity: 1.0 = perfectly uniform, 0.0 = very varied [0, 1]
         """
-        pixels = roi_image[mask > 127]
+        n, _, std = _masked_mean_std(roi_image, mask, mask_is_binary)
 
-        if len(pixels) == 0:
+        if n == 0:
             return 0.0
 
         # Low standard deviation = more uniform
-        std = pixels.std()
-
         # Normalize: std of 0 = perfectly uniform (1.0), std of 128 = very varied (0.0)
         uniformity = 1.0 - np.clip(std / 128.0, 0.0, 1.0)
 
@@ -357,7 +715,8 @@ class ShapeBasedSymmetryDetector:
     def compute_directional_gradient(
         self,
         roi_image: np.ndarray,
-        mask: np.ndarray
+        mask: np.ndarray,
+        mask_is_binary: bool = False
     ) -> float:
         """
         Measure directional brightness gradient (tilted = bright on one side)
@@ -365,40 +724,25 @@ class ShapeBasedSymmetryDetector:
         Args:
             roi_image: Grayscale ROI
             mask: Binary mask
+            mask_is_binary: mask is already 0/255 (e.g. from cv2.compare), skip re-thresholding
 
         Returns:
             gradient: 0.0 = uniform, 1.0 = strong directional gradient [0, 1]
         """
-        h, w = roi_image.shape
+        (n_left, left_mean), (n_right, right_mean), (n_top, top_mean), (n_bottom, bottom_mean) = \
+            _halves_means(roi_image, mask, mask_is_binary)
 
         # Compare left vs right halves
-        left_mask = mask[:, :w//2]
-        right_mask = mask[:, w//2:]
-
-        left_pixels = roi_image[:, :w//2][left_mask > 127]
-        right_pixels = roi_image[:, w//2:][right_mask > 127]
-
-        if len(left_pixels) == 0 or len(right_pixels) == 0:
+        if n_left == 0 or n_right == 0:
             return 0.0
 
-        left_mean = left_pixels.mean()
-        right_mean = right_pixels.mean()
-
         # Normalize difference
         horizontal_gradient = abs(left_mean - right_mean) / 255.0
 
         # Compare top vs bottom halves
-        top_mask = mask[:h//2, :]
-        bottom_mask = mask[h//2:, :]
-
-        top_pixels = roi_image[:h//2, :][top_mask > 127]
-        bottom_pixels = roi_image[h//2:, :][bottom_mask > 127]
-
-        if len(top_pixels) == 0 or len(bottom_pixels) == 0:
+        if n_top == 0 or n_bottom == 0:
             vertical_gradient = 0.0
         else:
-            top_mean = top_pixels.mean()
-            bottom_mean = bottom_pixels.mean()
             vertical_gradient = abs(top_mean - bottom_mean) / 255.0
 
         # Return maximum gradient (strongest directional bias)
@@ -409,7 +753,8 @@ class ShapeBasedSymmetryDetector:
         roi_image: np.ndarray,
         mask: np.ndarray,
         inner_fraction: float = 0.25,
-        outer_fraction: float = 0.50
+        outer_fraction: float = 0.50,
+        mask_is_binary: bool = False
     ) -> float:
         """
         Measure brightness of outer ring (for circular diamonds)
@@ -423,34 +768,27 @@ class ShapeBasedSymmetryDetector:
             mask: Binary mask
             inner_fraction: Inner radius as fraction of image size
             outer_fraction: Outer radius as fraction of image size
+            mask_is_binary: mask is already 0/255 (e.g. from cv2.compare), skip re-thresholding
 
         Returns:
             ring_brightness: Normalized brightness of ring [0, 1]
         """
         h, w = roi_image.shape
-        center_y, center_x = h // 2, w // 2
         max_radius = min(h, w) / 2
 
         inner_radius = int(max_radius * inner_fraction)
         outer_radius = int(max_radius * outer_fraction)
 
-        # Create ring mask
-        y_coords, x_coords = np.ogrid[:h, :w]
-        distances = np.sqrt((y_coords - center_y)**2 + (x_coords - center_x)**2)
-
-        ring_mask = ((distances >= inner_radius) &
-                     (distances <= outer_radius) &
-                     (mask > 127))
-
-        if ring_mask.sum() == 0:
-            return 0.0
+        # Ring mask (cached per shape), restricted to the diamond
+        inside = mask if mask_is_binary else cv2.compare(mask, 127, cv2.CMP_GT)
+        ring_mask = cv2.bitwise_and(_ring_mask(h, w, inner_radius, outer_radius), inside)
 
-        ring_pixels = roi_image[ring_mask]
+        n, mean, _ = _masked_mean_std(roi_image, ring_mask, mask_is_binary=True)
 
-        if len(ring_pixels) == 0:
+        if n == 0:
             return 0.0
 
-        return ring_pixels.mean() / 255.0
+        return mean / 255.0
 
     def is_circular_diamond(
         self,
@@ -460,7 +798,8 @@ class ShapeBasedSymmetryDetector:
         mask: np.ndarray,
         circularity_threshold: float = 0.85,
         aspect_ratio_threshold: float = 0.85,
-        verify_dark_center: bool = True
+        verify_dark_center: bool = True,
+        mask_is_binary: bool = False
     ) -> bool:
         """
         Detect if diamond is near-perfect circle (round brilliant cut)
@@ -473,6 +812,7 @@ class ShapeBasedSymmetryDetector:
             circularity_threshold: Minimum circularity for circle
             aspect_ratio_threshold: Minimum aspect ratio for circle
             verify_dark_center: Check for dark center + light ring pattern
+            mask_is_binary: mask is already 0/255 (e.g. from cv2.compare), skip re-thresholding
 
         Returns:
             is_circular: True if near-perfect circle
@@ -486,25 +826,25 @@ class ShapeBasedSymmetryDetector:
 
         # Optional: Verify dark center + light ring pattern
         if verify_dark_center:
+            # A very circular shape is accepted whatever the brightness pattern, so
+            # skip measuring it
+            if circularity > 0.92 and aspect_ratio > 0.92:
+                return True
+
             # Get central brightness
             center_brightness = self.compute_central_brightness(
-                roi_image, mask, radius_fraction=0.20
+                roi_image, mask, radius_fraction=0.20, mask_is_binary=mask_is_binary
             )
 
             # Get ring brightness
             ring_brightness = self.compute_ring_brightness(
-                roi_image, mask, inner_fraction=0.30, outer_fraction=0.60
+                roi_image, mask, inner_fraction=0.30, outer_fraction=0.60,
+                mask_is_binary=mask_is_binary
             )
 
             # Round brilliants typically have: dark center, lighter ring
             # If center is significantly darker than ring, this confirms circularity
-            if ring_brightness > center_brightness + 0.05:  # Ring at least 5% brighter
-                return True
-            # Even if not dark center pattern, accept if shape is very circular
-            elif circularity > 0.92 and aspect_ratio > 0.92:
-                return True
-            else:
-                return False
+            return ring_brightness > center_brightness + 0.05  # Ring at least 5% brighter
 
         return True
 
@@ -512,7 +852,8 @@ class ShapeBasedSymmetryDetector:
         self,
         roi_image: np.ndarray,
         mask: np.ndarray,
-        num_angles: int = 8
+        num_angles: int = 8,
+        scores: Optional[Dict[float, float]] = None
     ) -> Tuple[float, int]:
         """
         Check symmetry at multiple rotation angles (for circular diamonds)
@@ -526,26 +867,53 @@ class ShapeBasedSymmetryDetector:
             roi_image: Grayscale ROI
             mask: Binary mask
             num_angles: Number of angles to check (default: 8 = every 45°)
+            scores: Optional precomputed {angle: symmetry} from compute_axis_symmetries;
+                    angles missing from it are computed here
 
         Returns:
             (avg_symmetry, num_symmetric_axes): Average symmetry and count of symmetric axes
         """
-        angles = [i * 180.0 / num_angles for i in range(num_angles)]
-        symmetry_scores = []
-
+        angles = self.multi_axis_angles(num_angles)
+        if scores is None or any(angle not in scores for angle in angles):
+            scores = self.compute_axis_symmetries(
+                roi_image, mask, angles,
+                rotations=self.multi_axis_rotations(roi_image.shape, num_angles)
+            )
         threshold = 0.75  # Threshold for considering an axis "symmetric"
-        num_symmetric = 0
 
-        for angle in angles:
-            symmetry = self.compute_mirror_symmetry(roi_image, mask, angle)
-            symmetry_scores.append(symmetry)
-            if symmetry > threshold:
-                num_symmetric += 1
+        # float64 like the previous list average, so the mean is unchanged
+        symmetry_scores = np.empty(len(angles), dtype=np.float64)
+        for i, angle in enumerate(angles):
+            symmetry_scores[i] = scores[angle]
 
-        avg_symmetry = np.mean(symmetry_scores)
+        num_symmetric = int(np.count_nonzero(symmetry_scores > threshold))
+        avg_symmetry = symmetry_scores.mean()
 
         return avg_symmetry, num_symmetric
 
+    @staticmethod
+    def _empty_result() -> ShapeSymmetryResult:
+        """Zeroed result for an empty or degenerate mask (fallback horizontal/vertical axes)"""
+        return ShapeSymmetryResult(
+            major_axis_angle=0.0,
+            minor_axis_angle=90.0,
+            symmetry_score_major=0.0,
+            symmetry_score_minor=0.0,
+            best_symmetry_score=0.0,
+            table_brightness=0.0,
+            brightness_uniformity=0.0,
+            directional_gradient=0.0,
+            num_bright_spots=0,
+            axis_line_major=((0, 0), (1, 1)),
+            axis_line_minor=((0, 0), (1, 1)),
+            aspect_ratio=1.0,
+            circularity=0.0,
+            is_circular=False,
+            ring_brightness=0.0,
+            multi_axis_symmetry=0.0,
+            num_symmetric_axes=0
+        )
+
     def analyze_symmetry(
         self,
         roi_image: np.ndarray,
@@ -559,31 +927,53 @@ class ShapeBasedSymmetryDetector:
             mask: Binary mask
 
         Returns:
-            result: ShapeSymmetryResult
+            result: ShapeSymmetryResult (axis lines in the input ROI's coordinates)
         """
+        # Empty mask: every measurement below would come out zero (and the axes
+        # fall back to horizontal/vertical), so skip straight to that result.
+        # Small masks are still analyzed - downscaled images detect diamonds
+        # down to min_area=30 pixels
+        if cv2.countNonZero(mask) == 0:
+            return self._empty_result()
+
+        # Optionally analyze large ROIs at a canonical resolution
+        scale = 1.0
+        if self.max_analysis_size is not None:
+            h, w = roi_image.shape
+            if max(h, w) > self.max_analysis_size:
+                scale = self.max_analysis_size / max(h, w)
+                size = (max(1, round(w * scale)), max(1, round(h * scale)))
+                roi_image = cv2.resize(roi_image, size, interpolation=cv2.INTER_AREA)
+                mask = cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
+
         # Apply CLAHE to normalize lighting (fixes inconsistent illumination)
         # This helps when one quadrant is lighter than the rest
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        roi_image_normalized = clahe.apply(roi_image)
+        clahe = self._clahe
+        if self.clahe_crop_to_mask:
+            # Only the diamond's bounding box is analyzed, so equalize just that
+            x, y, bw, bh = cv2.boundingRect(mask)
+            roi_image_normalized = roi_image.copy()
+            if bw > 0 and bh > 0:
+                roi_image_normalized[y:y + bh, x:x + bw] = clahe.apply(roi_image[y:y + bh, x:x + bw])
+        else:
+            roi_image_normalized = clahe.apply(roi_image)
 
         # Use normalized image for symmetry analysis
         roi_image = roi_image_normalized
 
-        # Fit ellipse to get natural axes
-        ellipse = self.fit_ellipse_to_shape(mask)
+        # Fit ellipse to get natural axes (also returns the mask's outer contour)
+        ellipse, contour = self.fit_ellipse_to_shape(mask)
 
-        if ellipse is None:
-            # Fallback: Compute circularity from raw contour
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            if len(contours) > 0:
-                contour = max(contours, key=cv2.contourArea)
-                area = cv2.contourArea(contour)
-                perimeter = cv2.arcLength(contour, True)
-                circularity = (4 * np.pi * area) / (perimeter ** 2) if perimeter > 0 else 0.0
-                circularity = min(circularity, 1.0)
-            else:
-                circularity = 0.0
+        # Circularity from the same raw contour, without re-running findContours
+        if contour is not None:
+            area = cv2.contourArea(contour)
+            perimeter = cv2.arcLength(contour, True)
+            circularity = (4 * np.pi * area) / (perimeter ** 2) if perimeter > 0 else 0.0
+            circularity = min(circularity, 1.0)
+        else:
+            circularity = 0.0
 
+        if ellipse is None:
             # Fallback to horizontal/vertical axes
             major_angle = 0.0
             minor_angle = 90.0
@@ -600,37 +990,32 @@ class ShapeBasedSymmetryDetector:
             # Aspect ratio
             aspect_ratio = min(width, height) / max(width, height) if max(width, height) > 0 else 1.0
 
-            # Circularity from mask
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            if len(contours) > 0:
-                contour = max(contours, key=cv2.contourArea)
-                area = cv2.contourArea(contour)
-                perimeter = cv2.arcLength(contour, True)
-                circularity = (4 * np.pi * area) / (perimeter ** 2) if perimeter > 0 else 0.0
-                circularity = min(circularity, 1.0)
-            else:
-                circularity = 0.0
-
             # Get axis lines for visualization
             axis_line_major, axis_line_minor = self.get_axis_lines(ellipse, roi_image.shape)
 
-        # Compute symmetry along both axes
-        symmetry_major = self.compute_mirror_symmetry(roi_image, mask, major_angle)
-        symmetry_minor = self.compute_mirror_symmetry(roi_image, mask, minor_angle)
-
-        best_symmetry = max(symmetry_major, symmetry_minor)
+            if scale != 1.0:
+                # Map the lines back to the caller's (full-resolution) ROI
+                axis_line_major, axis_line_minor = (
+                    tuple((int(px / scale), int(py / scale)) for px, py in line)
+                    for line in (axis_line_major, axis_line_minor)
+                )
 
         # Extract bright regions
         bright_mask, num_bright = self.extract_bright_regions(roi_image, mask)
 
+        # Threshold the mask once for all masked brightness reductions below
+        inside = cv2.compare(mask, 127, cv2.CMP_GT)
+
         # Central brightness (table facet) - larger region for emerald cuts
-        table_brightness = self.compute_central_brightness(roi_image, mask, radius_fraction=0.25)
+        table_brightness = self.compute_central_brightness(
+            roi_image, inside, radius_fraction=0.25, mask_is_binary=True
+        )
 
         # Brightness uniformity
-        uniformity = self.compute_brightness_uniformity(roi_image, mask)
+        uniformity = self.compute_brightness_uniformity(roi_image, inside, mask_is_binary=True)
 
         # Directional gradient (tilted diamonds are bright on one side)
-        directional_grad = self.compute_directional_gradient(roi_image, mask)
+        directional_grad = self.compute_directional_gradient(roi_image, inside, mask_is_binary=True)
 
         # Detect if diamond is circular (round brilliant cut)
         # Lower threshold for SAM-detected diamonds (masks aren't pixel-perfect)
@@ -638,18 +1023,41 @@ class ShapeBasedSymmetryDetector:
             circularity=circularity,
             aspect_ratio=aspect_ratio,
             roi_image=roi_image,
-            mask=mask,
+            mask=inside,
             circularity_threshold=0.75,  # Lowered from 0.85 for SAM masks
-            aspect_ratio_threshold=0.85
+            aspect_ratio_threshold=0.85,
+            mask_is_binary=True
+        )
+
+        # Compute symmetry along both axes, plus the multi-axis angles for circular
+        # diamonds, in one pass that reuses a single pair of rotation buffers and
+        # warps each distinct angle only once
+        axis_angles = [major_angle, minor_angle]
+        rotations = None
+        if is_circular:
+            axis_angles += self.multi_axis_angles(8)
+            rotations = self.multi_axis_rotations(roi_image.shape, 8)
+        rot_img = np.empty_like(roi_image)
+        rot_mask = np.empty_like(mask)
+        axis_scores = self.compute_axis_symmetries(
+            roi_image, mask, axis_angles, dst_img=rot_img, dst_mask=rot_mask,
+            rotations=rotations
         )
 
+        symmetry_major = axis_scores[major_angle]
+        symmetry_minor = axis_scores[minor_angle]
+
+        best_symmetry = max(symmetry_major, symmetry_minor)
+
         # Compute ring brightness (for circular diamonds)
-        ring_brightness = self.compute_ring_brightness(roi_image, mask)
+        ring_brightness = self.compute_ring_brightness(roi_image, inside, mask_is_binary=True)
 
         # For circular diamonds: check multi-axis symmetry (radial symmetry test)
         # Round diamonds on table have similar appearance from many angles
         if is_circular:
-            multi_axis_sym, num_sym_axes = self.compute_multi_axis_symmetry(roi_image, mask, num_angles=8)
+            multi_axis_sym, num_sym_axes = self.compute_multi_axis_symmetry(
+                roi_image, mask, num_angles=8, scores=axis_scores
+            )
         else:
             # Non-circular: just use best of major/minor
             multi_axis_sym = best_symmetry
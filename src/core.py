@@ -2,22 +2,254 @@
 Core Diamond Classification Engine
 Handles detection, classification, and grading
 """
+import os
+import threading
 import cv2
 import numpy as np
 import joblib
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass, asdict
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
+from dataclasses import dataclass
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from preprocessing import SAMDiamondDetector, DiamondROI
 from classification import PureGeometricClassifier
 from grading import PickupGrader
+from forest_kernel import compile_forest
+
+# Below this many rows, joblib dispatch costs more than parallel tree traversal saves
+MIN_PARALLEL_ROWS = 3
+
+# Below this many diamonds, per-image feature extraction stays on the calling thread
+MIN_PARALLEL_DIAMONDS = 4
+
+# JPEG settings for saved visualizations - quality 85 is visually identical
+# for labeled overlays and encodes faster / smaller than OpenCV's default 95
+VIS_JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 85, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+
+# Model feature name -> expression over a GeometricAnalysisResult and diamond type
+_FEATURE_EXPRESSIONS = {
+    'outline_sym': 'result.outline_symmetry_score',
+    'reflection_sym': 'result.reflection_symmetry_score',
+    'aspect_ratio': 'result.aspect_ratio',
+    'spot_sym': 'result.spot_symmetry_score',
+    'has_spot': '1 if result.has_large_central_spot else 0',
+    'num_reflections': 'result.num_reflection_spots',
+    'type_emerald': "1 if diamond_type == 'emerald' else 0",
+    'type_other': "1 if diamond_type == 'other' else 0",
+}
+
+
+def save_json(path, data):
+    """
+    Write data as indented JSON
+
+    Uses orjson when installed (also serializes numpy scalars/arrays),
+    otherwise the standard library json module.
+    """
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+def save_ndjson(path, records: Iterable[dict]) -> int:
+    """
+    Write records as newline-delimited JSON, one compact object per line
+
+    Records are serialized as they are produced, so a generator of results
+    (e.g. DiamondClassifier.classify_images_stream) is written without
+    holding more than one record in memory.
+
+    Returns:
+        Number of records written
+    """
+    count = 0
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            for record in records:
+                f.write(orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE))
+                count += 1
+    else:
+        with open(path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record))
+                f.write('\n')
+                count += 1
+    return count
+
+
+def load_json(path):
+    """Read a JSON file, using orjson when installed"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=4)
+def load_model(model_path: str, feature_names_path: str, mmap_mode: Optional[str] = None):
+    """
+    Load trained ML model and feature names, cached by path
+
+    Repeated calls with the same paths return the same objects, so the
+    RandomForest pickle is only deserialized once per process.
+
+    Args:
+        model_path: Path to trained ML model (.pkl)
+        feature_names_path: Path to feature names JSON
+        mmap_mode: joblib mmap mode (e.g. 'r') to map the model's numpy
+                   arrays from the OS page cache instead of reading them
+
+    Returns:
+        (model, feature_names)
+    """
+    model = joblib.load(model_path, mmap_mode=mmap_mode)
+    with open(feature_names_path, 'r') as f:
+        feature_names = json.load(f)
+    return model, feature_names
+
+
+@lru_cache(maxsize=8)
+def make_feature_row_builder(feature_names: Tuple[str, ...]):
+    """
+    Generate a function that builds one model input row in feature_names order
+
+    The row is emitted as a single unrolled tuple expression, so the column
+    order always matches feature_names.json with no per-ROI list building.
+
+    Args:
+        feature_names: Model feature names, in model column order
+
+    Returns:
+        build_feature_row(result, diamond_type) -> tuple of feature values
+
+    Raises:
+        ValueError: If a feature name has no known extraction
+    """
+    unknown = [name for name in feature_names if name not in _FEATURE_EXPRESSIONS]
+    if unknown:
+        raise ValueError(f"Unsupported model features: {unknown}")
+
+    values = ', '.join(f'({_FEATURE_EXPRESSIONS[name]})' for name in feature_names)
+    source = f"def build_feature_row(result, diamond_type):\n    return ({values},)\n"
+
+    namespace = {}
+    exec(source, namespace)
+    return namespace['build_feature_row']
+
+
+@lru_cache(maxsize=4)
+def load_onnx_session(onnx_path: str, n_threads: int = 0):
+    """
+    Load ONNX Runtime session for a converted model, cached by path and thread count
+
+    The ONNX model is produced by convert_model_onnx.py and is an optional
+    faster inference backend for the RandomForest.
+
+    Args:
+        onnx_path: Path to converted model (.onnx)
+        n_threads: Intra-op threads for the session (0 = ONNX Runtime default,
+                   one per core)
+
+    Returns:
+        onnxruntime.InferenceSession, or None if onnxruntime is not installed
+        or the model has not been converted
+    """
+    if not Path(onnx_path).exists():
+        return None
+
+    try:
+        import onnxruntime
+    except ImportError:
+        return None
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = n_threads
+    return onnxruntime.InferenceSession(onnx_path, sess_options=options,
+                                        providers=['CPUExecutionProvider'])
+
+
+@lru_cache(maxsize=4)
+def load_compiled_forest(model_path: str, feature_names_path: str, mmap_mode: Optional[str] = None):
+    """
+    Build a Numba-compiled copy of the cached model, cached like load_model
+
+    Returns:
+        CompiledForest, or None if numba is not installed
+    """
+    model, _ = load_model(model_path, feature_names_path, mmap_mode)
+    return compile_forest(model)
+
+
+def predict_proba(model, X: np.ndarray, n_jobs: int = -1,
+                  onnx_session=None, forest=None) -> np.ndarray:
+    """
+    Class probabilities for a feature matrix using the fastest available backend
+
+    Order of preference: ONNX Runtime session, Numba-compiled forest,
+    then the scikit-learn model itself.
+
+    Args:
+        model: Fitted scikit-learn model
+        X: (N, 8) feature matrix, ideally float32 (other dtypes are converted once)
+        n_jobs: Worker count for prediction (scikit-learn and the compiled
+                forest; an ONNX session gets its thread count when it is loaded)
+        onnx_session: Optional session from load_onnx_session
+        forest: Optional CompiledForest from load_compiled_forest
+
+    Returns:
+        (N, n_classes) probabilities
+    """
+    # Every backend traverses trees on float32 (scikit-learn's tree DTYPE);
+    # converting here means no backend makes its own float64 -> float32 copy
+    X = np.ascontiguousarray(X, dtype=np.float32)
+
+    if onnx_session is not None:
+        return onnx_session.run(None, {'X': X})[1]
+
+    n_jobs = n_jobs if len(X) >= MIN_PARALLEL_ROWS else 1
+
+    if forest is not None:
+        return forest.predict_proba(X, n_jobs)
+
+    if getattr(model, 'n_jobs', n_jobs) != n_jobs:
+        model = _with_n_jobs(model, n_jobs)
+    return model.predict_proba(X)
+
+
+def _with_n_jobs(model, n_jobs: int):
+    """
+    Shallow copy of a fitted model with its own n_jobs
+
+    load_model() shares one cached model across classifiers and threads, so
+    it is never modified; the copy shares the fitted trees and only owns its
+    attribute dict. The instance dict is copied directly rather than through
+    copy.copy, which would re-run scikit-learn's unpickling version check.
+    """
+    view = object.__new__(type(model))
+    view.__dict__.update(model.__dict__)
+    view.n_jobs = n_jobs
+    return view
 
 
 @dataclass
 class ClassificationResult:
     """Single diamond classification result"""
+    # One per diamond, so no per-instance __dict__
+    __slots__ = ('roi_id', 'diamond_type', 'orientation', 'confidence', 'features',
+                 'bounding_box', 'center', 'area')
+
     roi_id: int
     diamond_type: str  # Auto-detected: 'round', 'emerald', 'other'
     orientation: str  # 'table' or 'tilted'
@@ -27,6 +259,19 @@ class ClassificationResult:
     center: Tuple[float, float]
     area: float
 
+    def to_dict(self):
+        """Convert to dictionary for JSON export"""
+        return {
+            'roi_id': self.roi_id,
+            'diamond_type': self.diamond_type,
+            'orientation': self.orientation,
+            'confidence': self.confidence,
+            'features': dict(self.features),
+            'bounding_box': self.bounding_box,
+            'center': self.center,
+            'area': self.area
+        }
+
 
 @dataclass
 class ImageResult:
@@ -41,12 +286,24 @@ class ImageResult:
     classifications: List[ClassificationResult]
     model_name: str = 'RandomForest'
     model_accuracy: str = '95.6%'
+    image_scale: float = 1.0  # Decoded size relative to the original file
 
     def to_dict(self):
         """Convert to dictionary for JSON export"""
-        result = asdict(self)
-        result['classifications'] = [asdict(c) for c in self.classifications]
-        return result
+        # Built field by field - asdict() would deep-copy every classification
+        return {
+            'image_name': self.image_name,
+            'total_diamonds': self.total_diamonds,
+            'table_count': self.table_count,
+            'tilted_count': self.tilted_count,
+            'pickable_count': self.pickable_count,
+            'invalid_count': self.invalid_count,
+            'average_grade': self.average_grade,
+            'classifications': [c.to_dict() for c in self.classifications],
+            'model_name': self.model_name,
+            'model_accuracy': self.model_accuracy,
+            'image_scale': self.image_scale
+        }
 
 
 class DiamondClassifier:
@@ -56,67 +313,173 @@ class DiamondClassifier:
     Auto-detects diamond type and classifies orientation using ML
     """
 
-    def __init__(self, model_path: str, feature_names_path: str):
+    def __init__(self, model_path: str, feature_names_path: str,
+                 n_jobs: Optional[int] = None, mmap_mode: Optional[str] = None,
+                 feature_workers: Optional[int] = None):
         """
         Initialize classifier
 
         Args:
             model_path: Path to trained ML model (.pkl)
             feature_names_path: Path to feature names JSON
+            n_jobs: Worker count for ML prediction (default: RF_N_JOBS env or -1)
+            mmap_mode: joblib mmap mode for loading the model (see load_model)
+            feature_workers: Threads for per-mask detection post-processing and
+                             per-diamond feature extraction
+                             (default: FEATURE_WORKERS env or CPU count; 1 = serial)
         """
-        self.model = joblib.load(model_path)
-        with open(feature_names_path, 'r') as f:
-            self.feature_names = json.load(f)
+        self._model_args = (str(model_path), str(feature_names_path), mmap_mode)
+        self.model, self.feature_names = load_model(*self._model_args)
+        self.n_jobs = n_jobs if n_jobs is not None else int(os.environ.get('RF_N_JOBS', -1))
+
+        # Faster inference backends: a converted ONNX model next to the pickle
+        # (convert_model_onnx.py), else a Numba-compiled copy of the forest;
+        # predict_proba falls back to scikit-learn when neither is available
+        self.onnx_session = load_onnx_session(str(Path(model_path).with_suffix('.onnx')),
+                                              max(0, self.n_jobs))
+        self.forest = load_compiled_forest(*self._model_args) if self.onnx_session is None else None
+
+        if feature_workers is None:
+            feature_workers = int(os.environ.get('FEATURE_WORKERS', os.cpu_count() or 1))
+        self.feature_workers = max(1, feature_workers)
 
         self.feature_extractor = PureGeometricClassifier()
+
+        # ML input rows in feature_names.json column order, reused across
+        # images instead of a new array per image
+        self._build_feature_row = make_feature_row_builder(tuple(self.feature_names))
+        self._X_buf = np.empty((256, len(self.feature_names)), dtype=np.float32)
+
+        # OpenCV and NumPy release the GIL, so diamonds are analyzed on a thread
+        # pool; PureGeometricClassifier keeps reusable buffers, so every pool
+        # thread gets its own instance
+        self._feature_pool = None
+        self._thread_state = threading.local()
         self.detector = None
         self.grader = None
 
-    def _initialize_detector(self, image_shape: Tuple[int, int]):
-        """Initialize detector with adaptive area thresholds"""
-        h, w = image_shape
-        image_pixels = h * w
-        base_pixels = 1944 * 2592
-        scale_factor = np.sqrt(image_pixels / base_pixels)
-        base_area_scale = scale_factor ** 2
-        min_area = max(30, int(200 * base_area_scale))
-        max_area = max(1000, int(20000 * base_area_scale))
-
-        self.detector = SAMDiamondDetector(
-            min_area=min_area,
-            max_area=max_area,
-            padding=10,
-            merge_overlapping=False
-        )
+        # Detector / grader per image size, so mixed-size batches get the
+        # right thresholds without re-initializing on every call. Detection may
+        # run on another thread than classification (e.g. verify_interactive's
+        # prefetcher), so creating detectors and running FastSAM take a lock
+        self._detectors: Dict[Tuple[int, int], SAMDiamondDetector] = {}
+        self._detector_lock = threading.RLock()
+        self._graders: Dict[int, PickupGrader] = {}
+
+    def _initialize_detector(self, image_shape: Tuple[int, int]) -> SAMDiamondDetector:
+        """Get the detector with adaptive area thresholds for this image size"""
+        with self._detector_lock:
+            h, w = image_shape
+            detector = self._detectors.get((h, w))
+            if detector is not None:
+                return detector
+
+            image_pixels = h * w
+            base_pixels = 1944 * 2592
+            base_area_scale = image_pixels / base_pixels
+            min_area = max(30, int(200 * base_area_scale))
+            max_area = max(1000, int(20000 * base_area_scale))
+
+            detector = SAMDiamondDetector(
+                min_area=min_area,
+                max_area=max_area,
+                padding=10,
+                merge_overlapping=False,
+                mask_workers=self.feature_workers
+            )
 
-    def _initialize_grader(self, image_width: int):
-        """Initialize grader with image-specific parameters"""
-        self.grader = PickupGrader(
-            check_orientation=True,
-            image_width_px=image_width
-        )
+            # Share the already loaded FastSAM weights between sizes
+            for other in self._detectors.values():
+                if other.model is not None:
+                    detector.model = other.model
+                    break
+
+            self._detectors[(h, w)] = detector
+            return detector
+
+    def _initialize_grader(self, image_width: int) -> PickupGrader:
+        """Get the grader with image-specific parameters for this image width"""
+        grader = self._graders.get(image_width)
+        if grader is None:
+            grader = PickupGrader(
+                check_orientation=True,
+                image_width_px=image_width
+            )
+            self._graders[image_width] = grader
+        return grader
+
+    def _analyze_roi(self, roi: DiamondROI):
+        """Geometric features for one ROI with the calling thread's extractor"""
+        extractor = getattr(self._thread_state, 'feature_extractor', None)
+        if extractor is None:
+            extractor = PureGeometricClassifier()
+            self._thread_state.feature_extractor = extractor
+        return extractor.analyze(roi.contour, roi.mask, roi.roi_image)
+
+    def _extract_features(self, diamond_rois: List[DiamondROI]) -> List:
+        """Geometric analysis for every ROI, threaded when there are enough of them"""
+        if self.feature_workers == 1 or len(diamond_rois) < MIN_PARALLEL_DIAMONDS:
+            return [self.feature_extractor.analyze(roi.contour, roi.mask, roi.roi_image)
+                    for roi in diamond_rois]
+
+        if self._feature_pool is None:
+            self._feature_pool = ThreadPoolExecutor(max_workers=self.feature_workers)
+        return list(self._feature_pool.map(self._analyze_roi, diamond_rois))
+
+    def detect_batch(self, images: List[np.ndarray]) -> List[List[DiamondROI]]:
+        """
+        Run diamond detection for several images, one FastSAM batch per image size
+
+        The returned ROI lists can be passed to classify_image(diamond_rois=...).
 
-    def classify_image(self, image: np.ndarray, image_name: str = "image") -> ImageResult:
+        Args:
+            images: Input BGR images
+
+        Returns:
+            List of DiamondROI lists, in input order
+        """
+        by_shape: Dict[Tuple[int, int], List[int]] = {}
+        for idx, image in enumerate(images):
+            by_shape.setdefault(image.shape[:2], []).append(idx)
+
+        detections = [None] * len(images)
+        for shape, indices in by_shape.items():
+            with self._detector_lock:
+                detector = self._initialize_detector(shape)
+                self.detector = detector
+                batch = detector.detect_batch([images[idx] for idx in indices])
+            for idx, diamond_rois in zip(indices, batch):
+                detections[idx] = diamond_rois
+
+        return detections
+
+    def classify_image(self, image: np.ndarray, image_name: str = "image",
+                       image_scale: float = 1.0,
+                       diamond_rois: Optional[List[DiamondROI]] = None) -> ImageResult:
         """
         Classify all diamonds in an image
 
         Args:
             image: Input BGR image
             image_name: Name of the image (for result tracking)
+            image_scale: Decode scale of image relative to the original file
+            diamond_rois: Detections for this image from detect_batch()
+                          (default: run the detector)
 
         Returns:
             ImageResult with all classifications
         """
         h, w = image.shape[:2]
 
-        # Initialize detector and grader if needed
-        if self.detector is None:
-            self._initialize_detector((h, w))
-        if self.grader is None:
-            self._initialize_grader(w)
+        # Grader matching this image size (created on first use)
+        self.grader = self._initialize_grader(w)
 
-        # Detect diamonds
-        diamond_rois = self.detector.detect(image)
+        # Detect diamonds with the detector for this image size
+        if diamond_rois is None:
+            with self._detector_lock:
+                detector = self._initialize_detector((h, w))
+                self.detector = detector
+                diamond_rois = detector.detect(image)
 
         if len(diamond_rois) == 0:
             return ImageResult(
@@ -127,56 +490,59 @@ class DiamondClassifier:
                 pickable_count=0,
                 invalid_count=0,
                 average_grade=0.0,
-                classifications=[]
+                classifications=[],
+                image_scale=image_scale
             )
 
-        # Classify each diamond
-        table_count = 0
-        tilted_count = 0
-        classifications = []
+        # Extract geometric features for every diamond first
+        results = self._extract_features(diamond_rois)
+        diamond_types = []
 
-        for roi in diamond_rois:
-            # Extract geometric features
-            result = self.feature_extractor.analyze(roi.contour, roi.mask, roi.roi_image)
+        # Feature rows go into the classifier's reusable buffer (grown on demand)
+        n = len(diamond_rois)
+        if n > len(self._X_buf):
+            self._X_buf = np.empty((max(n, 2 * len(self._X_buf)), len(self.feature_names)),
+                                   dtype=np.float32)
+        X = self._X_buf[:n]
 
+        for i, (roi, result) in enumerate(zip(diamond_rois, results)):
             # AUTO-DETECT diamond type (no user input required)
             diamond_type = roi.detected_type  # 'round', 'emerald', or 'other'
 
             # Prepare features for ML model
-            features = [
-                result.outline_symmetry_score,
-                result.reflection_symmetry_score,
-                result.aspect_ratio,
-                result.spot_symmetry_score,
-                1 if result.has_large_central_spot else 0,
-                result.num_reflection_spots,
-                1 if diamond_type == 'emerald' else 0,
-                1 if diamond_type == 'other' else 0
-            ]
-
-            # Predict orientation
-            X = np.array([features])
-            prediction = self.model.predict(X)[0]
-            probability = self.model.predict_proba(X)[0]
-
-            orientation = 'table' if prediction == 1 else 'tilted'
-            confidence = probability[prediction]
+            X[i] = self._build_feature_row(result, diamond_type)
+            diamond_types.append(diamond_type)
+
+        # Predict orientation for all diamonds in one batch
+        # predict() is argmax over predict_proba(), so labels and confidences
+        # are derived from one probability matrix for the whole batch
+        probabilities = predict_proba(self.model, X, self.n_jobs, self.onnx_session, self.forest)
+        best = probabilities.argmax(axis=1)
+        predictions = self.model.classes_[best]
+        confidences = probabilities[np.arange(n), best]
 
+        table_count = int((predictions == 1).sum())
+        tilted_count = n - table_count
+
+        # Plain Python str/float lists for the per-diamond loop
+        orientations = np.where(predictions == 1, 'table', 'tilted').tolist()
+        confidence_values = confidences.tolist()
+
+        # Classify each diamond
+        classifications = []
+
+        for roi, result, diamond_type, orientation, confidence in zip(
+                diamond_rois, results, diamond_types, orientations, confidence_values):
             # Update ROI with classification
             roi.orientation = orientation
             roi.ml_confidence = confidence
 
-            if orientation == 'table':
-                table_count += 1
-            else:
-                tilted_count += 1
-
             # Store classification result
             classifications.append(ClassificationResult(
                 roi_id=roi.id,
                 diamond_type=diamond_type,
                 orientation=orientation,
-                confidence=float(confidence),
+                confidence=confidence,
                 features={
                     'outline_sym': float(result.outline_symmetry_score),
                     'reflection_sym': float(result.reflection_symmetry_score),
@@ -208,7 +574,53 @@ class DiamondClassifier:
             pickable_count=len(pickable),
             invalid_count=len(invalid),
             average_grade=float(avg_grade),
-            classifications=classifications
+            classifications=classifications,
+            image_scale=image_scale
+        )
+
+    def classify_images_stream(self, images: Iterable[Tuple[str, np.ndarray]]) -> Iterator[ImageResult]:
+        """
+        Classify images one at a time, yielding each result as soon as it is ready
+
+        images may itself be a generator (e.g. loading files lazily), so only
+        the current image and its ROIs are resident; pair with save_ndjson
+        to write folder-sized runs incrementally:
+
+            save_ndjson(path, (r.to_dict() for r in classifier.classify_images_stream(images)))
+
+        Args:
+            images: (image_name, BGR image) pairs
+
+        Yields:
+            ImageResult per image, in input order
+        """
+        for name, image in images:
+            yield self.classify_image(image, name)
+
+    def classify_images(self, images: List[Tuple[str, np.ndarray]],
+                        n_jobs: int = -1) -> List[ImageResult]:
+        """
+        Classify several images in parallel worker processes
+
+        Each loky worker builds its own single-threaded classifier from the
+        model paths once and keeps it for every image it is sent, so only
+        the images (memory-mapped by joblib when large) cross process
+        boundaries. Visualization state stays in the workers, so
+        get_visualization() does not reflect these images.
+
+        Args:
+            images: (image_name, BGR image) pairs
+            n_jobs: Number of worker processes (-1 = one per core)
+
+        Returns:
+            ImageResult per image, in input order
+        """
+        if len(images) <= 1 or n_jobs == 1:
+            return [self.classify_image(image, name) for name, image in images]
+
+        return joblib.Parallel(n_jobs=n_jobs, backend='loky')(
+            joblib.delayed(_classify_in_worker)(self._model_args, image, name)
+            for name, image in images
         )
 
     def get_visualization(self) -> Optional[np.ndarray]:
@@ -244,3 +656,18 @@ class DiamondClassifier:
                 return gd.roi.roi_image
 
         return None
+
+
+@lru_cache(maxsize=2)
+def _worker_classifier(model_path: str, feature_names_path: str,
+                       mmap_mode: Optional[str]) -> DiamondClassifier:
+    """Per-process classifier for classify_images, created on the first task"""
+    # Workers already use every core between them - keep prediction single-threaded
+    return DiamondClassifier(model_path, feature_names_path, n_jobs=1, mmap_mode=mmap_mode,
+                             feature_workers=1)
+
+
+def _classify_in_worker(model_args: Tuple[str, str, Optional[str]], image: np.ndarray,
+                        image_name: str) -> ImageResult:
+    """Classify one image with this worker's cached classifier"""
+    return _worker_classifier(*model_args).classify_image(image, image_name)
@@ -0,0 +1,137 @@
+"""
+Numba-compiled RandomForest inference
+Flattens fitted scikit-learn trees into flat arrays and walks them in one JIT kernel
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange, get_num_threads, set_num_threads
+except ImportError:
+    njit = None
+    prange = range
+
+
+def _predict_proba_kernel(X, feature, threshold, left, right, value, roots, out):
+    """Average normalized leaf values over all trees for every sample"""
+    n_samples = X.shape[0]
+    n_trees = roots.shape[0]
+    n_classes = value.shape[1]
+
+    for i in prange(n_samples):
+        for c in range(n_classes):
+            out[i, c] = 0.0
+
+        for t in range(n_trees):
+            node = roots[t]
+            while left[node] != -1:
+                if X[i, feature[node]] <= threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+
+            for c in range(n_classes):
+                out[i, c] += value[node, c]
+
+        for c in range(n_classes):
+            out[i, c] /= n_trees
+
+
+# Serial build for n_jobs=1 callers (e.g. one of several batch worker
+# processes), so they never start Numba's all-core thread pool
+_predict_proba_serial = None
+
+if njit is not None:
+    _predict_proba_serial = njit(cache=True)(_predict_proba_kernel)
+    _predict_proba_kernel = njit(parallel=True, cache=True)(_predict_proba_kernel)
+
+
+class CompiledForest:
+    """
+    Inference-only copy of a fitted RandomForestClassifier
+
+    All trees are concatenated into flat node arrays (child indices offset
+    to global node ids, leaves marked -1) so a single Numba kernel can walk
+    every sample through every tree without Python dispatch.
+    """
+
+    def __init__(self, model):
+        """
+        Args:
+            model: Fitted single-output RandomForestClassifier
+        """
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+            rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+
+            # Per-tree class probabilities at each node, as in DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            offset += n_nodes
+
+        self.classes_ = model.classes_
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.int64)
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64)
+        self.left = np.ascontiguousarray(np.concatenate(lefts), dtype=np.int64)
+        self.right = np.ascontiguousarray(np.concatenate(rights), dtype=np.int64)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int64)
+
+    def predict_proba(self, X: np.ndarray, n_jobs: int = -1) -> np.ndarray:
+        """
+        Class probabilities for each row of X
+
+        Args:
+            X: (N, n_features) feature matrix
+            n_jobs: Threads to use (-1 = Numba's default, 1 = serial kernel)
+
+        Returns:
+            (N, n_classes) probabilities, matching the sklearn model
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        args = (X, self.feature, self.threshold, self.left, self.right, self.value, self.roots, out)
+
+        if n_jobs == 1:
+            _predict_proba_serial(*args)
+        elif n_jobs > 1:
+            # Numba's thread count is thread-local, so this does not affect
+            # other threads predicting at the same time
+            previous = get_num_threads()
+            set_num_threads(min(n_jobs, previous))
+            try:
+                _predict_proba_kernel(*args)
+            finally:
+                set_num_threads(previous)
+        else:
+            _predict_proba_kernel(*args)
+        return out
+
+
+def compile_forest(model):
+    """
+    Build a CompiledForest for a fitted model
+
+    Returns:
+        CompiledForest, or None if numba is not installed or the model is not
+        a single-output tree ensemble classifier
+    """
+    if njit is None:
+        return None
+
+    if not hasattr(model, 'estimators_') or getattr(model, 'n_outputs_', 1) != 1:
+        return None
+
+    return CompiledForest(model)
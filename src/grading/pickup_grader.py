@@ -1,16 +1,99 @@
 """
 Diamond pickup grading system based on orientation and neighbor proximity
 """
+import math
 import cv2
 import numpy as np
+from functools import lru_cache
 from typing import List, Tuple, Optional
 from dataclasses import dataclass
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _nearest_edges_kernel(centers, radii, ids, nearest, nearest_edge):
+    """Brute-force nearest edge neighbour per diamond without an N x N matrix"""
+    n = centers.shape[0]
+    for i in range(n):
+        best = np.inf
+        best_j = 0
+        for j in range(n):
+            if ids[j] == ids[i]:
+                continue  # Skip self-comparison
+            dx = centers[i, 0] - centers[j, 0]
+            dy = centers[i, 1] - centers[j, 1]
+            edge = math.sqrt(dx * dx + dy * dy) - radii[i] - radii[j]
+            # Strict comparison keeps the first closest neighbour, like argmin
+            if edge < best:
+                best = edge
+                best_j = j
+        nearest[i] = best_j
+        nearest_edge[i] = best
+
+
+if njit is not None:
+    # Serial: plates hold a few dozen diamonds, where starting a thread pool
+    # would cost more than the scan itself (large plates use the KD-tree)
+    _nearest_edges_kernel = njit(cache=True)(_nearest_edges_kernel)
+
+
+# Per-diamond label text in visualize_grades. The line type is explicit because
+# the putText default differs between OpenCV versions, and the cached glyph
+# masks are only exact for non-anti-aliased text
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_LINE_TYPE = cv2.LINE_8
+
+
+@lru_cache(maxsize=256)
+def _text_mask(text: str, font_scale: float, thickness: int) -> Tuple[np.ndarray, int, int]:
+    """
+    Read-only boolean glyph mask of putText output, cached by text and style
+
+    Returns:
+        (mask, origin_x, origin_y): mask and the text origin inside it
+    """
+    (text_w, text_h), baseline = cv2.getTextSize(text, LABEL_FONT, font_scale, thickness)
+    pad = thickness + 2
+    canvas = np.zeros((text_h + baseline + 2 * pad, text_w + 2 * pad), dtype=np.uint8)
+    origin_x, origin_y = pad, pad + text_h
+    cv2.putText(canvas, text, (origin_x, origin_y), LABEL_FONT, font_scale, 255, thickness,
+                LABEL_LINE_TYPE)
+
+    mask = canvas > 0
+    mask.flags.writeable = False
+    return mask, origin_x, origin_y
+
+
+def _put_text(image: np.ndarray, text: str, org: Tuple[int, int], font_scale: float,
+              color: Tuple[int, int, int], thickness: int):
+    """
+    Same pixels as cv2.putText(image, text, org, LABEL_FONT, ..., LABEL_LINE_TYPE)
+    from a cached glyph mask
+
+    Hershey text without anti-aliasing rasterizes identically at any integer
+    origin, so each distinct label is rendered once and pasted afterwards.
+    Labels that leave the image are drawn with putText itself, since its
+    clipping at the border does not always match a cropped mask.
+    """
+    mask, origin_x, origin_y = _text_mask(text, font_scale, thickness)
+    x0, y0 = org[0] - origin_x, org[1] - origin_y
+    h, w = image.shape[:2]
+
+    if x0 < 0 or y0 < 0 or x0 + mask.shape[1] > w or y0 + mask.shape[0] > h:
+        cv2.putText(image, text, org, LABEL_FONT, font_scale, color, thickness, LABEL_LINE_TYPE)
+        return
+
+    region = image[y0:y0 + mask.shape[0], x0:x0 + mask.shape[1]]
+    region[mask] = color
+
 
 @dataclass
 class GradedDiamond:
     """Diamond with pickup grade"""
-    roi: any  # DiamondROI
+    roi: any  # DiamondROI (always has orientation and detected_type)
     grade: Optional[float]  # -1 (invalid), None (oval/not pickable), 0-10 (pickup priority)
     nearest_distance: Optional[float]  # Distance to nearest neighbor
     radius: float  # Estimated radius from area
@@ -26,6 +109,11 @@ class PickupGrader:
     Supports all diamond types (round, emerald, baguette, heart)
     """
 
+    # Above this many diamonds the nearest-neighbour search uses a KD-tree
+    # instead of the full N x N distance matrix
+    KDTREE_MIN_DIAMONDS = 64
+    KDTREE_NEIGHBORS = 8
+
     def __init__(self, invalid_threshold: float = 1.5, check_orientation: bool = True, diamond_type: str = 'round',
                  plate_width_mm: float = 100.0, min_distance_mm: float = 2.0, image_width_px: Optional[int] = None):
         """
@@ -67,12 +155,18 @@ class PickupGrader:
         """
         graded_diamonds = []
 
+        if len(diamond_rois) == 0:
+            return graded_diamonds
+
+        # Radius from area (assuming roughly circular), nearest-neighbour edge
+        # distance and safety threshold for every diamond at once
+        radii, edge_distances, safety_thresholds = self._nearest_edge_distances(diamond_rois)
+
         for i, roi in enumerate(diamond_rois):
-            # Calculate radius from area (assuming roughly circular)
-            radius = np.sqrt(roi.area / np.pi)
+            radius = radii[i]
 
-            # Check orientation if enabled and orientation attribute exists
-            if self.check_orientation and hasattr(roi, 'orientation'):
+            # Check orientation if enabled (DiamondROI defaults it to 'unknown')
+            if self.check_orientation:
                 if roi.orientation == 'tilted':
                     # Oval diamonds are not pickable
                     graded = GradedDiamond(
@@ -84,8 +178,8 @@ class PickupGrader:
                     graded_diamonds.append(graded)
                     continue
 
-            # Calculate edge-to-edge distance to nearest neighbor
-            edge_distance, safety_threshold = self._find_nearest_edge_distance(roi, diamond_rois)
+            # Edge-to-edge distance to nearest neighbor
+            edge_distance, safety_threshold = edge_distances[i], safety_thresholds[i]
 
             # NEW RULE: If edge-to-edge distance < safety threshold, mark invalid
             # Safety threshold = radius for circular, diameter/6 for non-circular
@@ -112,10 +206,12 @@ class PickupGrader:
 
         return graded_diamonds
 
-    def _get_safety_threshold(self, roi) -> float:
+    def _get_safety_threshold(self, roi, radius: Optional[float] = None) -> float:
         """
         Get safety threshold for a diamond based on plate width and min distance
 
+        radius is the diamond's precomputed sqrt(area / pi), if the caller has it.
+
         If mm-to-pixel conversion is available (image_width_px provided):
             - Use fixed min_distance_mm threshold (default 2mm)
         Otherwise (fallback):
@@ -127,18 +223,107 @@ class PickupGrader:
             return self.min_distance_px
 
         # Fallback to radius-based thresholds
-        radius = np.sqrt(roi.area / np.pi)
+        if radius is None:
+            radius = math.sqrt(roi.area / math.pi)
 
         # Check if this is a circular diamond based on detected type
-        is_circular = False
-        if hasattr(roi, 'detected_type') and hasattr(roi, 'orientation'):
-            is_circular = (roi.detected_type == 'round' and roi.orientation == 'table')
+        is_circular = (roi.detected_type == 'round' and roi.orientation == 'table')
 
         if is_circular:
             return radius  # Use full radius for circular diamonds
         else:
             return radius / 3  # Use diameter/6 = radius/3 for non-circular diamonds
 
+    def _nearest_edge_distances(self, diamond_rois: List) -> Tuple[List[float], List[float], List[float]]:
+        """
+        Nearest-neighbour edge distance for every diamond in one vectorized pass
+
+        Vectorized equivalent of calling _find_nearest_edge_distance() for each
+        diamond: a KD-tree query for large plates, otherwise a compiled Numba
+        scan when numba is installed, or the N x N center distances from a
+        single broadcast. Every diamond is compared with ALL others (pickable AND
+        non-pickable).
+
+        Returns:
+            (radii, edge_distances, safety_thresholds), one entry per diamond
+        """
+        n = len(diamond_rois)
+        centers = np.array([roi.center for roi in diamond_rois], dtype=np.float64).reshape(n, 2)
+        radii = np.sqrt(np.array([roi.area for roi in diamond_rois], dtype=np.float64) / np.pi)
+        thresholds = np.array([self._get_safety_threshold(roi, radius)
+                               for roi, radius in zip(diamond_rois, radii.tolist())], dtype=np.float64)
+        ids = np.array([roi.id for roi in diamond_rois])
+
+        if n > self.KDTREE_MIN_DIAMONDS:
+            nearest, nearest_edge = self._nearest_edges_kdtree(centers, radii, ids)
+        elif njit is not None and ids.dtype.kind in 'iu':
+            nearest = np.empty(n, dtype=np.int64)
+            nearest_edge = np.empty(n, dtype=np.float64)
+            _nearest_edges_kernel(centers, radii, ids.astype(np.int64), nearest, nearest_edge)
+        else:
+            nearest, nearest_edge = self._nearest_edges_rows(centers, radii, ids, np.arange(n))
+        has_neighbor = np.isfinite(nearest_edge)
+
+        # Use the smaller threshold between target and neighbor
+        required = np.where(has_neighbor, np.minimum(thresholds, thresholds[nearest]), thresholds)
+        nearest_edge = np.where(has_neighbor, nearest_edge, 0.0)
+
+        return radii.tolist(), nearest_edge.tolist(), required.tolist()
+
+    @staticmethod
+    def _nearest_edges_rows(centers: np.ndarray, radii: np.ndarray, ids: np.ndarray,
+                            rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute-force nearest edge neighbour for the given rows against all diamonds
+
+        Returns:
+            (nearest, nearest_edge): neighbour index and edge distance per row
+            (inf when a diamond has no neighbour)
+        """
+        center_distances = np.linalg.norm(centers[rows, None, :] - centers[None, :, :], axis=-1)
+        edge = center_distances - radii[rows, None] - radii[None, :]
+        edge[ids[rows, None] == ids[None, :]] = np.inf  # Skip self-comparison
+
+        # argmin picks the first closest neighbour, like the scalar scan
+        nearest = edge.argmin(axis=1)
+        return nearest, edge[np.arange(len(rows)), nearest]
+
+    def _nearest_edges_kdtree(self, centers: np.ndarray, radii: np.ndarray,
+                              ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest edge neighbour per diamond from a KD-tree over the centers
+
+        Only the k nearest centers are scored. Edge distance also depends on
+        the neighbour's radius, so a row is accepted only when its best edge
+        distance beats the lower bound for every diamond outside the k
+        nearest (k-th center distance - own radius - largest radius); the
+        remaining rows fall back to the brute-force scan. Results match
+        _nearest_edges_rows() including first-index tie-breaking.
+        """
+        from scipy.spatial import cKDTree
+
+        n = len(centers)
+        k = min(self.KDTREE_NEIGHBORS + 1, n)  # +1 for the query point itself
+        tree_distances, candidates = cKDTree(centers).query(centers, k=k)
+
+        # Rescore candidates with the same distance formula as the brute-force path
+        center_distances = np.linalg.norm(centers[candidates] - centers[:, None, :], axis=-1)
+        edge = center_distances - radii[:, None] - radii[candidates]
+        edge[ids[candidates] == ids[:, None]] = np.inf  # Skip self-comparison
+
+        nearest_edge = edge.min(axis=1)
+        nearest = np.where(edge == nearest_edge[:, None], candidates, n).min(axis=1)
+
+        if k < n:
+            # Small margin absorbs rounding between the tree's and numpy's distances
+            bound = tree_distances[:, -1] - radii - radii.max() - 1e-6
+            unresolved = np.flatnonzero(~(nearest_edge < bound))
+            if len(unresolved):
+                nearest[unresolved], nearest_edge[unresolved] = self._nearest_edges_rows(
+                    centers, radii, ids, unresolved)
+
+        return nearest, nearest_edge
+
     def _find_nearest_edge_distance(self, target_roi, all_rois: List) -> Tuple[float, float]:
         """
         Find edge-to-edge distance to nearest neighbor and required safety threshold
@@ -150,9 +335,9 @@ class PickupGrader:
 
         IMPORTANT: Checks distance to ALL diamonds (pickable AND non-pickable).
         """
-        target_center = np.array(target_roi.center)
-        target_radius = np.sqrt(target_roi.area / np.pi)
-        target_threshold = self._get_safety_threshold(target_roi)
+        tx, ty = target_roi.center
+        target_radius = math.sqrt(target_roi.area / math.pi)
+        target_threshold = self._get_safety_threshold(target_roi, target_radius)
 
         min_edge_distance = float('inf')
         required_threshold = target_threshold
@@ -163,16 +348,17 @@ class PickupGrader:
                 continue
 
             # Calculate edge-to-edge distance
-            other_center = np.array(roi.center)
-            other_radius = np.sqrt(roi.area / np.pi)
-            other_threshold = self._get_safety_threshold(roi)
+            ox, oy = roi.center
+            other_radius = math.sqrt(roi.area / math.pi)
 
-            center_distance = np.linalg.norm(target_center - other_center)
+            center_distance = math.hypot(tx - ox, ty - oy)
             edge_distance = center_distance - target_radius - other_radius
 
             if edge_distance < min_edge_distance:
                 min_edge_distance = edge_distance
-                # Use the smaller threshold between target and neighbor
+                # Use the smaller threshold between target and neighbor (only
+                # looked up for neighbours that become the new closest one)
+                other_threshold = self._get_safety_threshold(roi, other_radius)
                 required_threshold = min(target_threshold, other_threshold)
 
         return (min_edge_distance if min_edge_distance != float('inf') else 0.0,
@@ -186,7 +372,7 @@ class PickupGrader:
         Even if the nearest neighbor is an oval/tilted diamond (not pickable),
         its proximity still affects the grading of the target diamond.
         """
-        target_center = np.array(target_roi.center)
+        tx, ty = target_roi.center
         min_distance = float('inf')
 
         for roi in all_rois:
@@ -195,8 +381,8 @@ class PickupGrader:
                 continue
 
             # Check distance to ALL other diamonds (pickable or not)
-            other_center = np.array(roi.center)
-            distance = np.linalg.norm(target_center - other_center)
+            ox, oy = roi.center
+            distance = math.hypot(tx - ox, ty - oy)
 
             if distance < min_distance:
                 min_distance = distance
@@ -204,7 +390,8 @@ class PickupGrader:
         return min_distance if min_distance != float('inf') else 0.0
 
     def visualize_grades(self, image: np.ndarray, graded_diamonds: List[GradedDiamond],
-                        save_path: Optional[str] = None) -> np.ndarray:
+                        save_path: Optional[str] = None,
+                        inplace: bool = False) -> np.ndarray:
         """
         Visualize pickup grades on image
 
@@ -219,11 +406,13 @@ class PickupGrader:
             image: Input image
             graded_diamonds: List of graded diamonds
             save_path: Optional path to save visualization
+            inplace: Draw directly into image instead of a copy (skips a
+                     full-frame copy when the caller no longer needs the original)
 
         Returns:
             Visualized image
         """
-        vis_image = image.copy()
+        vis_image = image if inplace else image.copy()
 
         for gd in graded_diamonds:
             # Skip oval diamonds (no marking)
@@ -247,9 +436,7 @@ class PickupGrader:
             cx, cy = int(gd.roi.center[0]), int(gd.roi.center[1])
 
             # Check if this is a circular diamond based on detected type
-            is_circular = (hasattr(gd.roi, 'detected_type') and
-                          gd.roi.detected_type == 'round' and
-                          hasattr(gd.roi, 'orientation') and
+            is_circular = (gd.roi.detected_type == 'round' and
                           gd.roi.orientation == 'table')
 
             if is_circular:
@@ -263,15 +450,13 @@ class PickupGrader:
                 # Draw small filled circle at center
                 cv2.circle(vis_image, (cx, cy), 5, color, -1)
 
-            # Draw label
-            cv2.putText(vis_image, label, (cx - 20, cy - int(gd.radius) - 5),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-            cv2.putText(vis_image, label, (cx - 20, cy - int(gd.radius) - 5),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            # Draw label (white outline, then coloured fill)
+            label_org = (cx - 20, cy - int(gd.radius) - 5)
+            _put_text(vis_image, label, label_org, 0.5, (255, 255, 255), 2)
+            _put_text(vis_image, label, label_org, 0.5, color, 1)
 
             # Draw ID
-            cv2.putText(vis_image, str(gd.roi.id), (cx - 8, cy + 5),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 2)
+            _put_text(vis_image, str(gd.roi.id), (cx - 8, cy + 5), 0.4, (255, 255, 255), 2)
 
         # Add legend
         legend_y = 30
@@ -295,8 +480,32 @@ class PickupGrader:
 
         return vis_image
 
+    @staticmethod
+    def _draw_outlines(vis_image: np.ndarray, diamonds: List[GradedDiamond],
+                       color: Tuple[int, int, int], require_table: bool):
+        """
+        Outline a group of same-coloured diamonds
+
+        Round diamonds (on table, when require_table) get a circle of their
+        estimated radius; all other contours go to a single drawContours call.
+        """
+        contours = []
+        for gd in diamonds:
+            is_circular = (gd.roi.detected_type == 'round' and
+                           (not require_table or gd.roi.orientation == 'table'))
+
+            if is_circular:
+                cx, cy = int(gd.roi.center[0]), int(gd.roi.center[1])
+                cv2.circle(vis_image, (cx, cy), int(gd.radius), color, 2)
+            else:
+                contours.append(gd.roi.contour)
+
+        if contours:
+            cv2.drawContours(vis_image, contours, -1, color, 2)
+
     def visualize_pickup_order(self, image: np.ndarray, graded_diamonds: List[GradedDiamond],
-                              save_path: Optional[str] = None) -> np.ndarray:
+                              save_path: Optional[str] = None,
+                              inplace: bool = False) -> np.ndarray:
         """
         Visualize pickup status (simplified view for operators)
 
@@ -309,60 +518,32 @@ class PickupGrader:
             image: Input image
             graded_diamonds: List of graded diamonds
             save_path: Optional path to save visualization
+            inplace: Draw directly into image instead of a copy (skips a
+                     full-frame copy when the caller no longer needs the original)
 
         Returns:
             Visualized image
         """
-        vis_image = image.copy()
-
-        # Draw TILTED diamonds (grade is None) - RED
-        tilted_diamonds = [gd for gd in graded_diamonds if gd.grade is None]
-        for gd in tilted_diamonds:
-            color = (0, 0, 255)  # Red for tilted/not on table
-            cx, cy = int(gd.roi.center[0]), int(gd.roi.center[1])
-            radius = np.sqrt(gd.roi.area / np.pi)
-
-            # Check if this is a round diamond
-            is_round = (hasattr(gd.roi, 'detected_type') and gd.roi.detected_type == 'round')
-
-            if is_round:
-                cv2.circle(vis_image, (cx, cy), int(radius), color, 2)
-            else:
-                cv2.drawContours(vis_image, [gd.roi.contour], -1, color, 2)
-
-        # Draw TABLE diamonds that are too close (grade == -1) - ORANGE
-        proximity_failed = [gd for gd in graded_diamonds if gd.grade == -1]
-        for gd in proximity_failed:
-            color = (0, 165, 255)  # Orange for proximity failed
-            cx, cy = int(gd.roi.center[0]), int(gd.roi.center[1])
-
-            # Check if this is a circular diamond based on detected type
-            is_circular = (hasattr(gd.roi, 'detected_type') and
-                          gd.roi.detected_type == 'round' and
-                          hasattr(gd.roi, 'orientation') and
-                          gd.roi.orientation == 'table')
-
-            if is_circular:
-                cv2.circle(vis_image, (cx, cy), int(gd.radius), color, 2)
-            else:
-                cv2.drawContours(vis_image, [gd.roi.contour], -1, color, 2)
-
-        # Draw PICKABLE diamonds (grade >= 0) - GREEN
-        pickable = [gd for gd in graded_diamonds if gd.grade is not None and gd.grade >= 0]
-        for gd in pickable:
-            color = (0, 255, 0)  # Green for pickable
-            cx, cy = int(gd.roi.center[0]), int(gd.roi.center[1])
-
-            # Check if this is a circular diamond based on detected type
-            is_circular = (hasattr(gd.roi, 'detected_type') and
-                          gd.roi.detected_type == 'round' and
-                          hasattr(gd.roi, 'orientation') and
-                          gd.roi.orientation == 'table')
-
-            if is_circular:
-                cv2.circle(vis_image, (cx, cy), int(gd.radius), color, 2)
-            else:
-                cv2.drawContours(vis_image, [gd.roi.contour], -1, color, 2)
+        vis_image = image if inplace else image.copy()
+
+        # One outline pass per status colour, drawn in this order so pickable
+        # diamonds end up on top: TILTED (grade is None) - RED, TABLE but too
+        # close (grade == -1) - ORANGE, PICKABLE (grade >= 0) - GREEN
+        tilted_diamonds = []
+        proximity_failed = []
+        pickable = []
+        for gd in graded_diamonds:
+            if gd.grade is None:
+                tilted_diamonds.append(gd)
+            elif gd.grade == -1:
+                proximity_failed.append(gd)
+            elif gd.grade >= 0:
+                pickable.append(gd)
+
+        # Tilted round diamonds are still outlined as circles
+        self._draw_outlines(vis_image, tilted_diamonds, (0, 0, 255), require_table=False)
+        self._draw_outlines(vis_image, proximity_failed, (0, 165, 255), require_table=True)
+        self._draw_outlines(vis_image, pickable, (0, 255, 0), require_table=True)
 
         # Add simplified legend
         legend_y = 30
@@ -1,4 +1,5 @@
 """Diamond Detection Module"""
 from .sam_detector import SAMDiamondDetector, DiamondROI
+from .image_io import load_image, find_images
 
-__all__ = ['SAMDiamondDetector', 'DiamondROI']
+__all__ = ['SAMDiamondDetector', 'DiamondROI', 'load_image', 'find_images']
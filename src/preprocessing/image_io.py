@@ -0,0 +1,82 @@
+"""
+Image discovery and loading (reduced-resolution decode for oversized inputs)
+"""
+import os
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Reference resolution the detection thresholds were tuned on
+BASE_IMAGE_PIXELS = 1944 * 2592
+
+IMAGE_EXTENSIONS = frozenset({'.jp2', '.jpg', '.jpeg', '.png'})
+
+
+def find_images(directory) -> List[Path]:
+    """
+    List image files in a directory with a single directory scan
+
+    Args:
+        directory: Directory to search (not recursive)
+
+    Returns:
+        Image paths sorted by name
+    """
+    with os.scandir(directory) as entries:
+        image_files = [Path(entry.path) for entry in entries
+                       if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+                       and entry.is_file()]
+    image_files.sort()
+    return image_files
+
+
+def _peek_image_size(image_path: str) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from the file header without decoding pixels"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(image_path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def load_image(image_path: str,
+               max_pixels: int = 4 * BASE_IMAGE_PIXELS) -> Tuple[Optional[np.ndarray], float]:
+    """
+    Load a BGR image, decoding oversized inputs at reduced resolution
+
+    Images larger than max_pixels are decoded at 1/2 or 1/4 scale so the
+    decoder moves fewer pixels. Area thresholds are derived from the decoded
+    image size downstream, so they follow the reduced resolution.
+
+    Args:
+        image_path: Path to image file
+        max_pixels: Largest pixel count decoded at full resolution
+
+    Returns:
+        (image, scale):
+        - image: Decoded BGR image, or None if loading failed
+        - scale: Decoded size relative to the original (1.0, 0.5 or 0.25)
+    """
+    flag, scale = cv2.IMREAD_COLOR, 1.0
+
+    size = _peek_image_size(str(image_path))
+    if size is not None:
+        pixels = size[0] * size[1]
+        if pixels > 4 * max_pixels:
+            flag, scale = cv2.IMREAD_REDUCED_COLOR_4, 0.25
+        elif pixels > max_pixels:
+            flag, scale = cv2.IMREAD_REDUCED_COLOR_2, 0.5
+
+    try:
+        data = np.memmap(str(image_path), dtype=np.uint8, mode='r')
+    except (OSError, ValueError):
+        return None, scale
+
+    image = cv2.imdecode(data, flag)
+    return image, scale
@@ -2,12 +2,82 @@
 Diamond Detection using FastSAM
 Production version - simplified for ML-based classification
 """
+import os
+import threading
 import cv2
 import numpy as np
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional
 from dataclasses import dataclass
 from ultralytics import FastSAM
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+# Below this many masks, post-processing stays on the calling thread
+MIN_PARALLEL_MASKS = 4
+
+# Set bits per byte value, for counting pixels in bit-packed masks
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def _binary(mask: np.ndarray) -> np.ndarray:
+    """Boolean mask; masks thresholded on the inference device pass through as-is"""
+    return mask if mask.dtype == bool else mask > 0.5
+
+
+def _merge_adjacency_kernel(intersection, areas, overlap_threshold, adjacency):
+    """Pairwise merge rule of SAMDiamondDetector._merge_masks, one row per thread"""
+    n = areas.shape[0]
+    for i in prange(n):
+        for j in range(n):
+            inter = intersection[i, j]
+            union = areas[i] + areas[j] - inter
+            iou = inter / union if union > 0 else 0.0
+            containment_j = inter / areas[j] if areas[j] > 0 else 0.0
+            containment_i = inter / areas[i] if areas[i] > 0 else 0.0
+            larger = max(areas[i], areas[j])
+            smaller = min(areas[i], areas[j])
+            size_ratio = larger / smaller if smaller > 0 else 1.0
+            adjacency[i, j] = ((max(containment_i, containment_j) > 0.5) or
+                               (iou > overlap_threshold and size_ratio > 1.5) or
+                               (iou > 0.4))
+
+
+if njit is not None:
+    _merge_adjacency_kernel = njit(parallel=True, cache=True)(_merge_adjacency_kernel)
+
+
+def _merge_adjacency(intersection: np.ndarray, areas: np.ndarray,
+                     overlap_threshold: float) -> np.ndarray:
+    """
+    N x N boolean "should merge" matrix from pairwise intersections and areas
+
+    Uses the compiled kernel when numba is installed, otherwise the same rule
+    as whole-matrix NumPy operations.
+    """
+    if njit is not None:
+        adjacency = np.empty(intersection.shape, dtype=np.bool_)
+        _merge_adjacency_kernel(intersection, areas, float(overlap_threshold), adjacency)
+        return adjacency
+
+    union = areas[:, None] + areas[None, :] - intersection
+    iou = np.divide(intersection, union, out=np.zeros_like(union), where=union > 0)
+    containment = np.divide(intersection, areas[None, :], out=np.zeros_like(intersection),
+                            where=areas[None, :] > 0)
+    max_containment = np.maximum(containment, containment.T)
+
+    larger = np.maximum(areas[:, None], areas[None, :])
+    smaller = np.minimum(areas[:, None], areas[None, :])
+    size_ratio = np.divide(larger, smaller, out=np.ones_like(larger), where=smaller > 0)
+
+    return ((max_containment > 0.5) |
+            ((iou > overlap_threshold) & (size_ratio > 1.5)) |
+            (iou > 0.4))
+
 
 @dataclass
 class DiamondROI:
@@ -17,8 +87,8 @@ class DiamondROI:
     center: Tuple[float, float]
     area: float
     perimeter: float
-    roi_image: np.ndarray
-    mask: np.ndarray
+    roi_image: np.ndarray  # View into the source image - copy before modifying either
+    mask: np.ndarray  # View into the ROI's own closed mask crop
     id: int
     ellipse: Tuple
     major_axis: float
@@ -38,7 +108,12 @@ class SAMDiamondDetector:
                  merge_overlapping: bool = False,
                  overlap_threshold: float = 0.25,
                  plate_width_mm: float = 100.0,
-                 min_diamond_size_mm: float = 0.5):
+                 min_diamond_size_mm: float = 0.5,
+                 merge_strategy: str = 'greedy',
+                 device: Optional[str] = None,
+                 mask_workers: Optional[int] = None,
+                 gpu_morphology: bool = False,
+                 compile_model: bool = False):
         """
         Initialize FastSAM diamond detector
 
@@ -50,6 +125,23 @@ class SAMDiamondDetector:
             overlap_threshold: IoU threshold for merging masks
             plate_width_mm: Width of plate in millimeters (default: 100mm)
             min_diamond_size_mm: Minimum diamond width/height in mm (default: 0.5mm)
+            merge_strategy: 'greedy' grows each merged mask and re-tests the rest
+                            against it (default); 'components' merges connected
+                            groups of pairwise-overlapping masks in one pass,
+                            which is faster for many masks but can group
+                            chains of masks differently
+            device: Torch device for FastSAM (default: 'cuda' when available,
+                    else 'cpu'); CUDA inference runs in FP16
+            mask_workers: Threads for per-mask post-processing
+                          (default: CPU count; 1 = serial)
+            gpu_morphology: Close masks with an OpenCV CUDA morphology filter
+                            when OpenCV is built with CUDA (ignored otherwise).
+                            Each small crop pays an upload/download, so this
+                            only pays off for large masks
+            compile_model: Wrap the FastSAM network in torch.compile after the
+                           first call (fixed shapes, CUDA graphs on GPU). Only
+                           worth it for long runs with one image size - every
+                           new input shape triggers a recompile
         """
         self.min_area = min_area
         self.max_area = max_area
@@ -58,6 +150,27 @@ class SAMDiamondDetector:
         self.overlap_threshold = overlap_threshold
         self.plate_width_mm = plate_width_mm
         self.min_diamond_size_mm = min_diamond_size_mm
+        self.merge_strategy = merge_strategy
+
+        if device is None:
+            import torch
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = device
+
+        # Closing kernel applied to every SAM mask, built once
+        self._close_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        # Optional CUDA closing filter; one filter is shared by the mask threads
+        self._gpu_close = None
+        self._gpu_lock = threading.Lock()
+        if gpu_morphology and hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0:
+            self._gpu_close = cv2.cuda.createMorphologyFilter(cv2.MORPH_CLOSE, cv2.CV_8UC1,
+                                                              self._close_kernel)
+
+        self.mask_workers = max(1, mask_workers if mask_workers is not None else (os.cpu_count() or 1))
+        self._mask_pool = None
+        self.compile_model = compile_model
+        self._compiled = False
         self.model = None
 
     def load_model(self):
@@ -65,13 +178,11 @@ class SAMDiamondDetector:
         if self.model is None:
             self.model = FastSAM('FastSAM-x.pt')
 
-    def _calculate_iou(self, mask1: np.ndarray, mask2: np.ndarray) -> float:
-        """Calculate Intersection over Union between two masks"""
-        intersection = np.logical_and(mask1, mask2).sum()
-        union = np.logical_or(mask1, mask2).sum()
-        return intersection / union if union > 0 else 0.0
-
-    def _is_valid_diamond_shape(self, contour: np.ndarray, mask: np.ndarray) -> bool:
+    def _is_valid_diamond_shape(self, contour: np.ndarray, mask: np.ndarray,
+                                contour_area: Optional[float] = None,
+                                bounding_box: Optional[Tuple[int, int, int, int]] = None,
+                                perimeter: Optional[float] = None,
+                                num_labels: Optional[int] = None) -> bool:
         """
         Validate that contour represents a real diamond
 
@@ -79,26 +190,21 @@ class SAMDiamondDetector:
         1. Solidity (ratio of contour area to convex hull area) - should be >0.7
         2. Number of holes - should be 0
         3. Extent (ratio of contour area to bounding box area) - should be >0.5
-        """
-        # Solidity check
-        hull = cv2.convexHull(contour)
-        hull_area = cv2.contourArea(hull)
-        contour_area = cv2.contourArea(contour)
-
-        if hull_area > 0:
-            solidity = contour_area / hull_area
-            if solidity < 0.70:
-                return False
-        else:
-            return False
 
-        # Check for holes
-        num_labels, _, _, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
-        if num_labels > 2:
-            return False
+        contour_area, bounding_box, perimeter and num_labels (connected
+        component count of mask) may be passed in when the caller has already
+        measured them; missing ones are computed.
+        """
+        # Cheapest checks first, so rejected shapes skip the hull and the
+        # component scan; all checks must pass, so the order does not change
+        # the result
+        if contour_area is None:
+            contour_area = cv2.contourArea(contour)
 
         # Extent check
-        x, y, w, h = cv2.boundingRect(contour)
+        if bounding_box is None:
+            bounding_box = cv2.boundingRect(contour)
+        x, y, w, h = bounding_box
         bbox_area = w * h
         if bbox_area > 0:
             extent = contour_area / bbox_area
@@ -106,43 +212,74 @@ class SAMDiamondDetector:
                 return False
 
         # Circularity check
-        perimeter = cv2.arcLength(contour, True)
+        if perimeter is None:
+            perimeter = cv2.arcLength(contour, True)
         if perimeter > 0:
             circularity = (4 * np.pi * contour_area) / (perimeter ** 2)
             if circularity < 0.30:
                 return False
 
+        # Solidity check
+        hull = cv2.convexHull(contour)
+        hull_area = cv2.contourArea(hull)
+
+        if hull_area > 0:
+            solidity = contour_area / hull_area
+            if solidity < 0.70:
+                return False
+        else:
+            return False
+
+        # Check for holes (mask is the ROI's crop, not the full frame)
+        if num_labels is None:
+            num_labels = cv2.connectedComponents(mask, connectivity=8)[0]
+        if num_labels > 2:
+            return False
+
         return True
 
     def _merge_masks(self, masks_list: List[np.ndarray]) -> List[np.ndarray]:
-        """Merge overlapping and nested masks"""
+        """Merge overlapping and nested masks (merged masks are returned as bool)"""
         if not self.merge_overlapping or len(masks_list) == 0:
             return masks_list
 
-        binary_masks = [(mask > 0.5).astype(np.uint8) for mask in masks_list]
+        n = len(masks_list)
+        shape = masks_list[0].shape
+
+        if self.merge_strategy == 'components':
+            flat = np.stack([_binary(mask) for mask in masks_list]).reshape(n, -1)
+            return self._merge_mask_components(flat, shape)
+
+        # One bit-packed row per mask (8 pixels per byte): the overlap of the
+        # growing merged mask with every other mask is one AND + popcount over
+        # the bytes the merged mask occupies
+        packed = np.stack([np.packbits(_binary(mask).reshape(-1)) for mask in masks_list])
+        areas = _POPCOUNT[packed].sum(axis=1, dtype=np.int64).tolist()
+
         merged = []
-        used = [False] * len(binary_masks)
+        used = [False] * n
 
-        for i in range(len(binary_masks)):
+        for i in range(n):
             if used[i]:
                 continue
 
-            current_merged = binary_masks[i].copy()
+            current_merged = packed[i].copy()
             used[i] = True
-            current_area = current_merged.sum()
+            current_area = areas[i]
+            intersections = self._intersections(packed, current_merged)
 
             changed = True
             while changed:
                 changed = False
-                for j in range(len(binary_masks)):
+                for j in range(n):
                     if used[j]:
                         continue
 
-                    mask_j = binary_masks[j]
-                    area_j = mask_j.sum()
+                    area_j = areas[j]
+                    intersection = intersections[j]
+                    union = current_area + area_j - intersection
 
-                    iou = self._calculate_iou(current_merged, mask_j)
-                    intersection = np.logical_and(current_merged, mask_j).sum()
+                    iou = intersection / union if union > 0 else 0.0
                     containment_j = intersection / area_j if area_j > 0 else 0.0
                     containment_current = intersection / current_area if current_area > 0 else 0.0
                     max_containment = max(containment_j, containment_current)
@@ -152,15 +289,47 @@ class SAMDiamondDetector:
                     should_merge = (max_containment > 0.5) or (iou > self.overlap_threshold and size_ratio > 1.5) or (iou > 0.4)
 
                     if should_merge:
-                        current_merged = np.logical_or(current_merged, mask_j).astype(np.uint8)
-                        current_area = current_merged.sum()
+                        current_merged |= packed[j]
+                        current_area = int(_POPCOUNT[current_merged].sum(dtype=np.int64))
                         used[j] = True
                         changed = True
+                        # Later candidates are compared with the grown mask
+                        intersections = self._intersections(packed, current_merged)
 
-            merged.append(current_merged.astype(np.float32))
+            pixels = np.unpackbits(current_merged, count=shape[0] * shape[1])
+            # unpackbits yields 0/1 bytes, so the bool view needs no extra pass
+            merged.append(pixels.reshape(shape).view(bool))
 
         return merged
 
+    def _merge_mask_components(self, flat: np.ndarray, shape: Tuple[int, int]) -> List[np.ndarray]:
+        """
+        Merge masks by connected components of the pairwise merge criterion
+
+        All pairwise intersections come from one sparse product (masks cover a
+        small part of the frame), the merge rule of _merge_masks is evaluated
+        on the whole N x N matrix, and each component is OR-reduced once.
+        """
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        sparse = csr_matrix(flat, dtype=np.int32)
+        intersection = (sparse @ sparse.T).toarray().astype(np.float64)
+        areas = np.ascontiguousarray(np.diag(intersection))
+        adjacency = _merge_adjacency(intersection, areas, self.overlap_threshold)
+
+        # Labels follow the lowest mask index in each group, like the greedy seeds
+        num_groups, labels = connected_components(csr_matrix(adjacency), directed=False)
+        return [np.logical_or.reduce(flat[labels == k], axis=0).reshape(shape)
+                for k in range(num_groups)]
+
+    @staticmethod
+    def _intersections(packed_masks: np.ndarray, mask: np.ndarray) -> List[int]:
+        """Pixel overlap of one bit-packed mask with every row of packed_masks"""
+        occupied = np.flatnonzero(mask)
+        overlap = packed_masks[:, occupied] & mask[occupied]
+        return _POPCOUNT[overlap].sum(axis=1, dtype=np.int64).tolist()
+
     def detect(self, image: np.ndarray) -> List[DiamondROI]:
         """
         Detect diamonds in image using FastSAM
@@ -171,11 +340,36 @@ class SAMDiamondDetector:
         Returns:
             List of DiamondROI objects
         """
+        return self._rois_from_result(self._run_model(image)[0], image)
+
+    def detect_batch(self, images: List[np.ndarray]) -> List[List[DiamondROI]]:
+        """
+        Detect diamonds in several images with one FastSAM call
+
+        The images are letterboxed to the same inference size and run as one
+        batch, so the per-call model overhead is paid once; post-processing
+        is the same as detect().
+
+        Args:
+            images: Input BGR images (same thresholds apply to all of them)
+
+        Returns:
+            List of DiamondROI lists, one per image
+        """
+        if len(images) == 0:
+            return []
+
+        results = self._run_model(list(images))
+        return [self._rois_from_result(result, image) for result, image in zip(results, images)]
+
+    def _run_model(self, source):
+        """Run FastSAM on one image or a list of images"""
         self.load_model()
 
         results = self.model(
-            image,
-            device='cpu',
+            source,
+            device=self.device,
+            half=self.device.startswith('cuda'),
             retina_masks=True,
             imgsz=1536,
             conf=0.15,
@@ -183,135 +377,285 @@ class SAMDiamondDetector:
             verbose=False
         )
 
-        diamond_rois = []
+        if self.compile_model and not self._compiled:
+            self._compile_network()
 
-        if results[0].masks is not None:
-            masks = results[0].masks.data.cpu().numpy()
-            masks = self._merge_masks(list(masks))
+        return results
 
-            roi_id = 0
+    def _compile_network(self):
+        """
+        Specialize the network with torch.compile once Ultralytics has set it up
 
-            for mask in masks:
-                mask_uint8 = (mask > 0.5).astype(np.uint8) * 255
-                area = np.sum(mask_uint8 > 0)
+        The first call builds the predictor (device placement, FP16, layer
+        fusion); the network inside it is compiled for the fixed imgsz=1536
+        input from then on.
+        """
+        import torch
 
-                if area < self.min_area or area > self.max_area:
-                    continue
+        self._compiled = True
+        backend = getattr(getattr(self.model, 'predictor', None), 'model', None)
+        if backend is None or not isinstance(getattr(backend, 'model', None), torch.nn.Module):
+            return
 
-                kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-                mask_uint8 = cv2.morphologyEx(mask_uint8, cv2.MORPH_CLOSE, kernel, iterations=1)
+        mode = 'reduce-overhead' if self.device.startswith('cuda') else 'default'
+        backend.model = torch.compile(backend.model, mode=mode, dynamic=False)
 
-                contours, _ = cv2.findContours(mask_uint8, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    def _rois_from_result(self, result, image: np.ndarray) -> List[DiamondROI]:
+        """Turn one FastSAM result into validated DiamondROIs for its image"""
+        diamond_rois = []
 
-                if not contours:
-                    continue
+        if result.masks is not None:
+            # Threshold on the inference device; only 1-byte masks are copied back
+            masks = (result.masks.data > 0.5).cpu().numpy()
+            if self.merge_overlapping:
+                masks = self._merge_masks(list(masks))
+            masks, boxes, areas = self._area_prefilter(masks)
+
+            # OpenCV releases the GIL, so masks are post-processed on a thread
+            # pool; ids are assigned afterwards in mask order
+            if self.mask_workers > 1 and len(masks) >= MIN_PARALLEL_MASKS:
+                if self._mask_pool is None:
+                    self._mask_pool = ThreadPoolExecutor(max_workers=self.mask_workers)
+                candidates = list(self._mask_pool.map(
+                    lambda mask, box, area: self._process_mask(mask, image, box, area),
+                    masks, boxes, areas))
+            else:
+                candidates = [self._process_mask(mask, image, box, area)
+                              for mask, box, area in zip(masks, boxes, areas)]
+
+            diamond_rois = [diamond for diamond in candidates if diamond is not None]
+            for roi_id, diamond in enumerate(diamond_rois):
+                diamond.id = roi_id
 
-                contour = max(contours, key=cv2.contourArea)
+        diamond_rois = self._remove_nested_rois(diamond_rois)
+        return diamond_rois
 
-                if len(contour) < 5:
-                    continue
+    def _area_prefilter(self, masks):
+        """
+        Drop masks outside [min_area, max_area] in one pass over the mask stack
 
-                if not self._is_valid_diamond_shape(contour, mask_uint8):
-                    continue
+        Args:
+            masks: (N, H, W) mask array or list of masks
 
-                perimeter = cv2.arcLength(contour, True)
-                moments = cv2.moments(contour)
+        Returns:
+            (masks, boxes, areas): surviving (M, H, W) bool masks, their
+            x, y, w, h bounding boxes and their pixel areas
+        """
+        if len(masks) == 0:
+            return [], [], []
+
+        if isinstance(masks, list):
+            masks = np.stack([_binary(mask) for mask in masks])
+        n, height, width = masks.shape
+
+        areas = np.count_nonzero(masks.reshape(n, -1), axis=1)
+        keep = (areas >= self.min_area) & (areas <= self.max_area)
+        masks = masks[keep]
+        if len(masks) == 0:
+            return [], [], []
+
+        # Bounding boxes from the occupied rows/columns of each mask (first and
+        # last True via argmax on the projection and its reverse)
+        rows = masks.any(axis=2)
+        cols = masks.any(axis=1)
+        y = rows.argmax(axis=1)
+        x = cols.argmax(axis=1)
+        h = height - rows[:, ::-1].argmax(axis=1) - y
+        w = width - cols[:, ::-1].argmax(axis=1) - x
+        boxes = np.stack([x, y, w, h], axis=1).tolist()
+
+        return masks, boxes, areas[keep].tolist()
+
+    def _close(self, mask_uint8: np.ndarray) -> np.ndarray:
+        """3x3 elliptical closing, on the GPU when a CUDA filter is available"""
+        if self._gpu_close is None:
+            return cv2.morphologyEx(mask_uint8, cv2.MORPH_CLOSE, self._close_kernel, iterations=1)
+
+        with self._gpu_lock:
+            gpu_mask = cv2.cuda_GpuMat()
+            gpu_mask.upload(mask_uint8)
+            return self._gpu_close.apply(gpu_mask).download()
+
+    def _process_mask(self, mask: np.ndarray, image: np.ndarray,
+                      bounding_box: tuple = None, area: int = None) -> Optional[DiamondROI]:
+        """
+        Validate one SAM mask and build its DiamondROI
 
-                if moments['m00'] != 0:
-                    cx = moments['m10'] / moments['m00']
-                    cy = moments['m01'] / moments['m00']
-                else:
-                    continue
+        Args:
+            mask: Full-frame SAM mask
+            image: Source image
+            bounding_box: (x, y, w, h) of the mask from _area_prefilter
+                (default: measured here)
+            area: Pixel area of the mask from _area_prefilter, which has
+                already applied the area limits (default: measured and checked here)
 
-                ellipse = cv2.fitEllipse(contour)
-                (_, axes, _) = ellipse
-                major_axis = max(axes)
-                minor_axis = min(axes)
-                aspect_ratio = minor_axis / major_axis if major_axis > 0 else 0
+        Returns:
+            DiamondROI (id not yet assigned), or None if the mask is rejected
+        """
+        binary = _binary(mask)
+
+        if area is None:
+            area = np.count_nonzero(binary)
+            if area < self.min_area or area > self.max_area:
+                return None
+
+        if bounding_box is None:
+            # boundingRect on the 0/1 byte view scans the mask once in C
+            bounding_box = cv2.boundingRect(np.ascontiguousarray(binary).view(np.uint8))
+
+        # Work on the mask's bounding box only. The margin covers the ROI
+        # padding and keeps >= 2 empty pixels around the mask, so the 3x3
+        # closing and the contours match a full-frame pass
+        bx, by, bw, bh = bounding_box
+        margin = self.padding + 2
+        crop_y = max(0, by - margin)
+        crop_x = max(0, bx - margin)
+        crop_y_end = min(binary.shape[0], by + bh + margin)
+        crop_x_end = min(binary.shape[1], bx + bw + margin)
+
+        # The bool crop is reinterpreted as 0/1 bytes, so scaling to 0/255 is the only pass
+        mask_uint8 = binary[crop_y:crop_y_end, crop_x:crop_x_end].view(np.uint8) * np.uint8(255)
+        mask_uint8 = self._close(mask_uint8)
+
+        # One component scan up front: empty crops have no contour, and crops
+        # with several components fail the shape check whichever contour is
+        # the largest, so only single-component masks go on
+        num_labels = cv2.connectedComponents(mask_uint8, connectivity=8)[0]
+        if num_labels != 2:
+            return None
+
+        # A single 8-connected component has exactly one external contour
+        # (full-image coordinates)
+        contours, _ = cv2.findContours(mask_uint8, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE,
+                                       offset=(int(crop_x), int(crop_y)))
+        contour = contours[0]
+
+        if len(contour) < 5:
+            return None
+
+        # Measure the contour once for the shape checks and the ROI fields
+        perimeter = cv2.arcLength(contour, True)
+        points = contour.reshape(-1, 2)
+        x, y = points.min(axis=0).tolist()
+        x_max, y_max = points.max(axis=0).tolist()
+        w, h = x_max - x + 1, y_max - y + 1  # Same as cv2.boundingRect
 
-                # Detect diamond type based on aspect ratio
-                # Only distinguish between round (circular) and other (non-circular)
-                if aspect_ratio > 0.85:
-                    detected_type = 'round'
-                else:
-                    detected_type = 'other'
+        if not self._is_valid_diamond_shape(contour, mask_uint8, cv2.contourArea(contour),
+                                            (x, y, w, h), perimeter, num_labels):
+            return None
 
-                x, y, w, h = cv2.boundingRect(contour)
+        moments = cv2.moments(contour)
 
-                # Filter out unrealistically small diamonds based on real-world size
-                # Calculate minimum pixel size from mm (plate_width_mm matches image width)
-                image_width = image.shape[1]
-                px_per_mm = image_width / self.plate_width_mm
-                min_size_px = self.min_diamond_size_mm * px_per_mm
+        if moments['m00'] != 0:
+            cx = moments['m10'] / moments['m00']
+            cy = moments['m01'] / moments['m00']
+        else:
+            return None
+
+        ellipse = cv2.fitEllipse(contour)
+        (_, axes, _) = ellipse
+        major_axis = max(axes)
+        minor_axis = min(axes)
+        aspect_ratio = minor_axis / major_axis if major_axis > 0 else 0
+
+        # Detect diamond type based on aspect ratio
+        # Only distinguish between round (circular) and other (non-circular)
+        if aspect_ratio > 0.85:
+            detected_type = 'round'
+        else:
+            detected_type = 'other'
+
+        # Filter out unrealistically small diamonds based on real-world size
+        # Calculate minimum pixel size from mm (plate_width_mm matches image width)
+        image_width = image.shape[1]
+        px_per_mm = image_width / self.plate_width_mm
+        min_size_px = self.min_diamond_size_mm * px_per_mm
+
+        if w < min_size_px or h < min_size_px:
+            return None  # Skip diamonds smaller than minimum real-world size
+
+        x_pad = max(0, x - self.padding)
+        y_pad = max(0, y - self.padding)
+        x_end = min(image.shape[1], x + w + self.padding)
+        y_end = min(image.shape[0], y + h + self.padding)
+
+        # Views, not copies: the ROI reads from the source image and from this
+        # mask's private crop, both of which live as long as the ROI
+        roi_image = image[y_pad:y_end, x_pad:x_end]
+        roi_mask = mask_uint8[y_pad - crop_y:y_end - crop_y, x_pad - crop_x:x_end - crop_x]
+
+        return DiamondROI(
+            contour=contour,
+            bounding_box=(x, y, w, h),
+            center=(cx, cy),
+            area=area,
+            perimeter=perimeter,
+            roi_image=roi_image,
+            mask=roi_mask,
+            id=-1,  # Numbered by the caller
+            ellipse=ellipse,
+            major_axis=major_axis,
+            minor_axis=minor_axis,
+            aspect_ratio=aspect_ratio,
+            orientation='unknown',
+            detected_type=detected_type
+        )
 
-                if w < min_size_px or h < min_size_px:
-                    continue  # Skip diamonds smaller than minimum real-world size
+    @staticmethod
+    def _centers_inside(diamond_rois: List, candidates: np.ndarray) -> np.ndarray:
+        """
+        inside[i, j]: candidate pair whose ROI i center lies in ROI j's contour
 
-                x_pad = max(0, x - self.padding)
-                y_pad = max(0, y - self.padding)
-                x_end = min(image.shape[1], x + w + self.padding)
-                y_end = min(image.shape[0], y + h + self.padding)
+        Boundary points count as inside, like cv2.pointPolygonTest(...) >= 0.
+        Path.contains_points tests all candidate centers of a contour at once;
+        it leaves exact boundary points to the sign of a tiny radius, so points
+        where the two radius signs disagree are settled by pointPolygonTest.
+        """
+        from matplotlib.path import Path
 
-                roi_image = image[y_pad:y_end, x_pad:x_end].copy()
-                roi_mask = mask_uint8[y_pad:y_end, x_pad:x_end].copy()
+        centers = np.array([roi.center for roi in diamond_rois], dtype=np.float64).reshape(-1, 2)
+        inside = np.zeros(candidates.shape, dtype=bool)
 
-                diamond = DiamondROI(
-                    contour=contour,
-                    bounding_box=(x, y, w, h),
-                    center=(cx, cy),
-                    area=area,
-                    perimeter=perimeter,
-                    roi_image=roi_image,
-                    mask=roi_mask,
-                    id=roi_id,
-                    ellipse=ellipse,
-                    major_axis=major_axis,
-                    minor_axis=minor_axis,
-                    aspect_ratio=aspect_ratio,
-                    orientation='unknown',
-                    detected_type=detected_type
-                )
+        for j in np.flatnonzero(candidates.any(axis=0)).tolist():
+            rows = np.flatnonzero(candidates[:, j])
+            contour = diamond_rois[j].contour
+            path = Path(contour.reshape(-1, 2).astype(np.float64))
+            grown = path.contains_points(centers[rows], radius=1e-9)
+            shrunk = path.contains_points(centers[rows], radius=-1e-9)
 
-                diamond_rois.append(diamond)
-                roi_id += 1
+            result = grown & shrunk
+            for k in np.flatnonzero(grown != shrunk).tolist():
+                cx, cy = centers[rows[k]]
+                result[k] = cv2.pointPolygonTest(contour, (float(cx), float(cy)), False) >= 0
+            inside[rows, j] = result
 
-        diamond_rois = self._remove_nested_rois(diamond_rois)
-        return diamond_rois
+        return inside
 
     def _remove_nested_rois(self, diamond_rois: List) -> List:
         """Remove nested ROIs where one diamond is contained inside another"""
         if len(diamond_rois) <= 1:
             return diamond_rois
 
-        to_remove = set()
-
-        for i, roi_i in enumerate(diamond_rois):
-            if i in to_remove:
-                continue
+        # contained[i, j]: ROI i is smaller than ROI j and its bbox lies inside j's
+        boxes = np.array([roi.bounding_box for roi in diamond_rois], dtype=np.int64)
+        x0, y0 = boxes[:, 0], boxes[:, 1]
+        x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+        areas = np.array([roi.area for roi in diamond_rois], dtype=np.float64)
+        contained = ((x0[:, None] >= x0[None, :]) & (y0[:, None] >= y0[None, :]) &
+                     (x1[:, None] <= x1[None, :]) & (y1[:, None] <= y1[None, :]) &
+                     (areas[:, None] < areas[None, :]))
 
-            for j, roi_j in enumerate(diamond_rois):
-                if i == j or j in to_remove:
-                    continue
+        # Center-in-contour only for the bbox-contained candidates, one batched
+        # test per containing ROI
+        center_inside = self._centers_inside(diamond_rois, contained)
 
-                if roi_i.area >= roi_j.area:
-                    continue
-
-                cx_i, cy_i = roi_i.center
-                center_inside = cv2.pointPolygonTest(roi_j.contour, (float(cx_i), float(cy_i)), False) >= 0
-
-                if center_inside:
-                    x_i, y_i, w_i, h_i = roi_i.bounding_box
-                    x_j, y_j, w_j, h_j = roi_j.bounding_box
-
-                    bbox_contained = (
-                        x_i >= x_j and y_i >= y_j and
-                        (x_i + w_i) <= (x_j + w_j) and
-                        (y_i + h_i) <= (y_j + h_j)
-                    )
-
-                    if bbox_contained:
-                        to_remove.add(i)
-                        break
+        # Removal in the original order (a ROI already removed cannot contain another one)
+        to_remove = set()
+        for i in np.flatnonzero(center_inside.any(axis=1)).tolist():
+            for j in np.flatnonzero(center_inside[i]).tolist():
+                if j not in to_remove:
+                    to_remove.add(i)
+                    break
 
         filtered_rois = [roi for idx, roi in enumerate(diamond_rois) if idx not in to_remove]
 
@@ -0,0 +1,7 @@
+"""Make the project root and src/ importable, as the scripts do"""
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'src'))
@@ -0,0 +1,32 @@
+"""Prediction backends on a small fitted forest"""
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_kernel import compile_forest
+from src.core import predict_proba
+
+
+def test_predict_proba_leaves_shared_model_untouched():
+    rng = np.random.default_rng(0)
+    X = rng.random((40, 8))
+    y = (X[:, 0] > 0.5).astype(int)
+    model = RandomForestClassifier(n_estimators=5, random_state=0, n_jobs=None).fit(X, y)
+
+    expected = model.predict_proba(X.astype(np.float32))
+    for n_jobs in (2, 1, -1):
+        np.testing.assert_array_equal(predict_proba(model, X, n_jobs=n_jobs), expected)
+        assert model.n_jobs is None
+
+
+def test_compiled_forest_honours_n_jobs():
+    pytest.importorskip('numba')
+    rng = np.random.default_rng(1)
+    X = rng.random((60, 8))
+    y = (X[:, 1] > 0.4).astype(int)
+    model = RandomForestClassifier(n_estimators=7, random_state=0).fit(X, y)
+    forest = compile_forest(model)
+
+    expected = model.predict_proba(X.astype(np.float32))
+    for n_jobs in (1, 2, -1):
+        np.testing.assert_allclose(predict_proba(model, X, n_jobs=n_jobs, forest=forest), expected)
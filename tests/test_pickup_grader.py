@@ -0,0 +1,38 @@
+"""Nearest-neighbour search backends and cached label rendering"""
+import cv2
+import numpy as np
+import pytest
+
+from types import SimpleNamespace
+
+from grading.pickup_grader import LABEL_FONT, LABEL_LINE_TYPE, PickupGrader, _put_text
+
+
+@pytest.mark.parametrize('org', [(60, 50), (0, 8), (-6, 40), (180, 118), (150, 3)])
+@pytest.mark.parametrize('text, font_scale, thickness', [('7.5', 0.5, 2), ('7.5', 0.5, 1),
+                                                         ('12', 0.4, 2), ('-1', 0.5, 1)])
+def test_put_text_matches_opencv(org, text, font_scale, thickness):
+    # Inside the image the cached mask is pasted; across the border putText is used
+    expected = np.full((120, 200, 3), 40, dtype=np.uint8)
+    cv2.putText(expected, text, org, LABEL_FONT, font_scale, (0, 200, 255), thickness,
+                LABEL_LINE_TYPE)
+
+    actual = np.full((120, 200, 3), 40, dtype=np.uint8)
+    _put_text(actual, text, org, font_scale, (0, 200, 255), thickness)
+
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize('n', [12, 150])
+def test_nearest_edge_distances_match_brute_force(n):
+    # 12 diamonds take the Numba / broadcast path, 150 the KD-tree
+    rng = np.random.default_rng(n)
+    rois = [SimpleNamespace(id=i, center=tuple(rng.uniform(0, 2000, 2)), area=float(rng.uniform(300, 3000)),
+                            orientation='table', detected_type='round') for i in range(n)]
+    grader = PickupGrader(image_width_px=2000)
+
+    radii, edges, _ = grader._nearest_edge_distances(rois)
+
+    centers = np.array([roi.center for roi in rois])
+    _, expected = grader._nearest_edges_rows(centers, np.array(radii), np.arange(n), np.arange(n))
+    np.testing.assert_allclose(edges, expected)
@@ -0,0 +1,28 @@
+"""Axis-aligned mask rotation against per-plane warps"""
+import cv2
+import numpy as np
+import pytest
+
+from classification.pure_geometric_classifier import PureGeometricClassifier
+
+
+def _planes(count: int, size: int = 90):
+    planes = [np.zeros((size, size), dtype=np.uint8) for _ in range(count)]
+    cv2.ellipse(planes[0], (45, 45), (35, 22), 20, 0, 360, 255, -1)
+    for k, plane in enumerate(planes[1:], 1):
+        cv2.circle(plane, (30 + 10 * k, 40), 6 + 2 * k, 255, -1)
+    return planes
+
+
+@pytest.mark.parametrize('count', [1, 2, 3])
+def test_rotate_planes_matches_single_channel_warps(count):
+    classifier = PureGeometricClassifier()
+    planes = _planes(count)
+    rotation = cv2.getRotationMatrix2D((45, 45), 27.5 - 90, 1.0)
+
+    rotated = classifier._rotate_planes_to_axis(planes, rotation)
+
+    assert len(rotated) == count
+    for plane, result in zip(planes, rotated):
+        expected = cv2.warpAffine(plane, rotation, (90, 90), flags=classifier.mask_interpolation)
+        np.testing.assert_array_equal(result, expected)
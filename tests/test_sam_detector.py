@@ -0,0 +1,51 @@
+"""SAM mask post-processing without running the FastSAM network"""
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+
+from preprocessing.sam_detector import SAMDiamondDetector
+
+
+def _fake_result(masks: np.ndarray):
+    """Stand-in for an ultralytics result carrying only the mask tensor"""
+    return SimpleNamespace(masks=SimpleNamespace(data=torch.from_numpy(masks.astype(np.float32))))
+
+
+def _disk_masks():
+    masks = np.zeros((3, 400, 400), dtype=np.uint8)
+    cv2.circle(masks[0], (120, 150), 40, 1, -1)
+    cv2.ellipse(masks[1], (280, 260), (50, 35), 30, 0, 360, 1, -1)
+    cv2.circle(masks[2], (50, 350), 4, 1, -1)  # below min_area
+    return masks
+
+
+def test_rois_from_result_uses_prefilter_areas_and_boxes():
+    detector = SAMDiamondDetector(device='cpu', mask_workers=1)
+    image = np.full((400, 400, 3), 128, dtype=np.uint8)
+    masks = _disk_masks()
+
+    rois = detector._rois_from_result(_fake_result(masks), image)
+
+    assert [roi.id for roi in rois] == [0, 1]
+    assert [roi.area for roi in rois] == [int(np.count_nonzero(m)) for m in masks[:2]]
+
+
+def test_prefilter_matches_per_mask_path():
+    detector = SAMDiamondDetector(device='cpu', mask_workers=1)
+    image = np.full((400, 400, 3), 128, dtype=np.uint8)
+    masks = _disk_masks().astype(bool)
+
+    kept, boxes, areas = detector._area_prefilter(masks)
+    assert len(kept) == 2
+
+    for mask, box, area in zip(kept, boxes, areas):
+        assert tuple(box) == cv2.boundingRect(mask.view(np.uint8))
+        fast = detector._process_mask(mask, image, box, area)
+        slow = detector._process_mask(mask, image)
+        assert fast.area == slow.area
+        assert fast.bounding_box == slow.bounding_box
+        assert fast.center == slow.center
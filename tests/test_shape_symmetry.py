@@ -0,0 +1,80 @@
+"""Mirror symmetry scores against a direct numpy reference"""
+import cv2
+import numpy as np
+
+from classification.shape_based_symmetry import ShapeBasedSymmetryDetector
+
+
+def _reference_mirror_symmetry(rotated_image: np.ndarray, rotated_mask: np.ndarray) -> float:
+    """Left half vs. mirrored right half with np.corrcoef, as before the moment kernels"""
+    half = rotated_image.shape[1] // 2
+    left = rotated_image[:, :half]
+    right_mirror = np.fliplr(rotated_image[:, half:half + left.shape[1]])
+    valid = (rotated_mask[:, :half] > 127) & (np.fliplr(rotated_mask[:, half:half + left.shape[1]]) > 127)
+
+    left_pixels = left[valid].astype(np.float64)
+    right_pixels = right_mirror[valid].astype(np.float64)
+    correlation = np.corrcoef(left_pixels, right_pixels)[0, 1]
+    brightness_similarity = 1.0 - abs(left_pixels.mean() - right_pixels.mean()) / 255.0
+    return float(np.clip(0.7 * (correlation + 1.0) / 2.0 + 0.3 * brightness_similarity, 0.0, 1.0))
+
+
+def _large_roi(size: int = 320):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (size, size), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (9, 9), 0)
+    mask = np.zeros((size, size), dtype=np.uint8)
+    cv2.circle(mask, (size // 2, size // 2), size // 2 - 10, 255, -1)
+    return image, mask
+
+
+def test_mirror_symmetry_large_roi():
+    # Raw moments of a >= 300 px ROI make the scaled variance product exceed 2**64
+    detector = ShapeBasedSymmetryDetector()
+    image, mask = _large_roi()
+
+    # Angle 90 is the identity rotation, so the reference needs no warp
+    score = detector.compute_mirror_symmetry(image, mask, 90.0)
+
+    assert np.isfinite(score)
+    assert abs(score - _reference_mirror_symmetry(image, mask)) < 1e-9
+
+
+def test_small_mask_is_still_analyzed():
+    # Diamonds down to 30 px reach the classifier on images below base resolution
+    detector = ShapeBasedSymmetryDetector()
+    image, _ = _large_roi(40)
+    mask = np.zeros((40, 40), dtype=np.uint8)
+    cv2.ellipse(mask, (20, 20), (7, 4), 0, 0, 360, 255, -1)
+    assert cv2.countNonZero(mask) < 100
+
+    result = detector.analyze_symmetry(image, mask)
+
+    assert result.aspect_ratio < 0.9
+    assert result.best_symmetry_score > 0.0
+
+
+def test_empty_mask_matches_full_analysis_fallbacks():
+    detector = ShapeBasedSymmetryDetector()
+    image, _ = _large_roi(40)
+    result = detector.analyze_symmetry(image, np.zeros((40, 40), dtype=np.uint8))
+
+    assert result == detector._empty_result()
+
+
+def test_mirror_symmetry_matches_per_plane_warps():
+    detector = ShapeBasedSymmetryDetector()
+    image, mask = _large_roi(120)
+    h, w = image.shape
+
+    for angle in (0.0, 22.5, 37.0, 135.0):
+        rotation = cv2.getRotationMatrix2D((w // 2, h // 2), angle - 90, 1.0)
+        expected = _reference_mirror_symmetry(cv2.warpAffine(image, rotation, (w, h)),
+                                              cv2.warpAffine(mask, rotation, (w, h)))
+        assert abs(detector.compute_mirror_symmetry(image, mask, angle) - expected) < 1e-9
+
+    # Shared buffers across angles give the same scores as fresh warps
+    angles = [0.0, 22.5, 37.0, 135.0]
+    shared = detector.compute_axis_symmetries(image, mask, angles, dst_img=np.empty_like(image),
+                                              dst_mask=np.empty_like(mask))
+    assert shared == {angle: detector.compute_mirror_symmetry(image, mask, angle) for angle in angles}
@@ -4,26 +4,47 @@ Shows each ROI and verifies classification correctness
 Saves verification data for future retraining
 """
 import sys
+import threading
 from pathlib import Path
+from queue import Queue
 
 project_root = Path(__file__).parent.absolute()
 sys.path.insert(0, str(project_root / 'src'))
 
 import cv2
 import json
+import hashlib
+import pickle
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
 from datetime import datetime
 
 from src.core import DiamondClassifier
+from preprocessing import find_images
+
+# Images detected per FastSAM call in verify_batch
+DETECT_BATCH_SIZE = 8
+
+# Images decoded and detected ahead of the one being verified
+PREFETCH_IMAGES = 2
+
+# Verification window name and layout (pixels)
+WINDOW_NAME = 'verify'
+DISPLAY_HEIGHT = 900
+HEADER_HEIGHT = 40
+ROI_PANEL_WIDTH = 600
 
 
 class InteractiveVerifier:
     """Interactive verification of diamond classifications"""
 
-    def __init__(self, classifier: DiamondClassifier):
+    def __init__(self, classifier: DiamondClassifier, cache_dir: str = None):
+        """
+        Args:
+            classifier: Classifier used for detection and classification
+            cache_dir: Directory for cached FastSAM detections (default: no caching)
+        """
         self.classifier = classifier
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
         self.verifications = []
         self.current_idx = 0
         self.should_quit = False
@@ -31,26 +52,36 @@ class InteractiveVerifier:
         self.current_result = None
         self.current_image_path = None
 
-    def verify_image(self, image_path: str):
+    def verify_image(self, image_path: str, image: np.ndarray = None, diamond_rois: list = None):
         """
         Interactively verify all ROIs in an image
 
         Args:
             image_path: Path to image file
+            image: Already loaded image (default: read from image_path)
+            diamond_rois: Detections from DiamondClassifier.detect_batch (default: detect now)
         """
         self.current_image_path = Path(image_path)
 
         # Load image
-        self.current_image = cv2.imread(str(image_path))
+        self.current_image = image if image is not None else cv2.imread(str(image_path))
         if self.current_image is None:
             print(f"ERROR: Could not load {image_path}")
             return
 
+        # Detections from a previous session (or this batch), else run FastSAM now
+        if diamond_rois is None:
+            diamond_rois = self._cached_result(self.current_image_path)
+        if diamond_rois is None:
+            diamond_rois = self.classifier.detect_batch([self.current_image])[0]
+            self._store_result(self.current_image_path, diamond_rois)
+
         # Classify image
         print(f"\nClassifying {self.current_image_path.name}...")
         self.current_result = self.classifier.classify_image(
             self.current_image,
-            self.current_image_path.name
+            self.current_image_path.name,
+            diamond_rois=diamond_rois
         )
 
         if self.current_result.total_diamonds == 0:
@@ -63,8 +94,44 @@ class InteractiveVerifier:
         # Start interactive verification
         self._start_interactive_session()
 
+    def _cache_file(self, image_path: Path):
+        """Cache file for an image, keyed by its path, size and modification time"""
+        if self.cache_dir is None:
+            return None
+        try:
+            stat = image_path.stat()
+        except OSError:
+            return None
+        key = f"{image_path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        return self.cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.pkl"
+
+    def _cached_result(self, image_path: Path):
+        """
+        Detections saved for this exact image file, or None
+
+        Editing or replacing the image changes its size/mtime and therefore
+        its cache key, so stale detections are never returned.
+        """
+        cache_file = self._cache_file(image_path)
+        if cache_file is None or not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def _store_result(self, image_path: Path, diamond_rois: list):
+        """Save fresh detections (before classification updates them) for later sessions"""
+        cache_file = self._cache_file(Path(image_path))
+        if cache_file is None:
+            return
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'wb') as f:
+            pickle.dump(diamond_rois, f, protocol=pickle.HIGHEST_PROTOCOL)
+
     def _start_interactive_session(self):
-        """Start matplotlib interactive session"""
+        """Start the OpenCV verification window and process keys until done"""
         print("="*80)
         print("INTERACTIVE VERIFICATION")
         print("="*80)
@@ -76,22 +143,36 @@ class InteractiveVerifier:
         print("="*80)
         print()
 
-        plt.ion()
-        self.fig, (self.ax_context, self.ax_roi) = plt.subplots(1, 2, figsize=(16, 8))
-        self.fig.canvas.mpl_connect('key_press_event', self._on_key)
+        # The context image is downscaled once per image; each refresh only
+        # copies it and draws the overlays
+        self.display_scale = DISPLAY_HEIGHT / self.current_image.shape[0]
+        self.context_base = cv2.resize(self.current_image, None, fx=self.display_scale,
+                                       fy=self.display_scale, interpolation=cv2.INTER_AREA)
+
+        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
 
         self.current_idx = 0
         self._update_display()
-        plt.show(block=True)
 
-    def _on_key(self, event):
+        while self.current_idx < len(self.current_result.classifications) and not self.should_quit:
+            key = cv2.waitKey(50)
+            if key == -1:
+                # Closing the window counts as quitting
+                if cv2.getWindowProperty(WINDOW_NAME, cv2.WND_PROP_VISIBLE) < 1:
+                    self.should_quit = True
+                continue
+            self._on_key(chr(key & 0xFF))
+
+        cv2.destroyWindow(WINDOW_NAME)
+
+    def _on_key(self, key: str):
         """Handle keyboard input"""
         if self.current_idx >= len(self.current_result.classifications):
             return
 
         classification = self.current_result.classifications[self.current_idx]
 
-        if event.key == 'y':
+        if key == 'y':
             # Correct classification
             self.verifications.append({
                 'image': self.current_image_path.name,
@@ -107,14 +188,13 @@ class InteractiveVerifier:
             print(f"✓ ROI {classification.roi_id}: Verified as CORRECT ({classification.diamond_type.upper()}, {classification.orientation.upper()})")
             self.current_idx += 1
 
-        elif event.key == 'n':
-            # Wrong classification - need correction
+        elif key == 'n':
+            # Wrong classification - need correction (the window stays open
+            # while the labels are typed in the terminal)
             print(f"\n✗ ROI {classification.roi_id}: Marked as WRONG")
             print(f"  Predicted: {classification.diamond_type.upper()}, {classification.orientation.upper()}")
 
             # Ask for correct labels
-            plt.close(self.fig)
-
             correct_orientation = input("  Enter correct orientation (table/tilted): ").strip().lower()
             while correct_orientation not in ['table', 'tilted']:
                 correct_orientation = input("  Please enter 'table' or 'tilted': ").strip().lower()
@@ -140,88 +220,83 @@ class InteractiveVerifier:
             print(f"  Saved correction: {correct_type.upper()}, {correct_orientation.upper()}")
             self.current_idx += 1
 
-            # Reopen figure
-            self.fig, (self.ax_context, self.ax_roi) = plt.subplots(1, 2, figsize=(16, 8))
-            self.fig.canvas.mpl_connect('key_press_event', self._on_key)
-            plt.ion()
-
-        elif event.key == 's':
+        elif key == 's':
             # Skip
             print(f"⊘ ROI {classification.roi_id}: Skipped")
             self.current_idx += 1
 
-        elif event.key == 'q':
+        elif key == 'q':
             # Quit
             self.should_quit = True
-            plt.close(self.fig)
+            return
+
+        else:
             return
 
         # Update display or finish
         if self.current_idx >= len(self.current_result.classifications):
             print("\n✓ All ROIs verified!")
-            plt.close(self.fig)
             self.should_quit = True
         elif not self.should_quit:
             self._update_display()
 
     def _update_display(self):
-        """Update matplotlib display with current ROI"""
+        """Compose the context and ROI panels into one canvas and show it"""
         if self.current_idx >= len(self.current_result.classifications):
             return
 
         classification = self.current_result.classifications[self.current_idx]
+        font = cv2.FONT_HERSHEY_SIMPLEX
 
-        # Clear axes
-        self.ax_context.clear()
-        self.ax_roi.clear()
-
-        # Left: Full image context
-        img_rgb = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2RGB)
-        self.ax_context.imshow(img_rgb)
+        context = self.context_base.copy()
+        context_h, context_w = context.shape[:2]
+        canvas = np.zeros((HEADER_HEIGHT + context_h, context_w + ROI_PANEL_WIDTH, 3), dtype=np.uint8)
 
-        # Draw all bounding boxes
+        # Left: Full image context with all bounding boxes, current one on top
+        current_box = None
         for c in self.current_result.classifications:
-            x, y, w, h = c.bounding_box
-            color = 'yellow' if c.roi_id == classification.roi_id else 'gray'
-            linewidth = 3 if c.roi_id == classification.roi_id else 1
-            alpha = 1.0 if c.roi_id == classification.roi_id else 0.3
-
-            rect = Rectangle((x, y), w, h, fill=False,
-                            edgecolor=color, linewidth=linewidth, alpha=alpha)
-            self.ax_context.add_patch(rect)
-
+            x, y, w, h = (int(round(v * self.display_scale)) for v in c.bounding_box)
             if c.roi_id == classification.roi_id:
-                self.ax_context.text(x, y - 10, f"ROI #{c.roi_id}",
-                                   color='yellow', fontsize=12, fontweight='bold')
+                current_box = (x, y, w, h)
+            else:
+                cv2.rectangle(context, (x, y), (x + w, y + h), (90, 90, 90), 1)
 
-        self.ax_context.set_title(f'Context: {self.current_image_path.name}',
-                                 fontsize=12, fontweight='bold')
-        self.ax_context.axis('off')
+        if current_box is not None:
+            x, y, w, h = current_box
+            cv2.rectangle(context, (x, y), (x + w, y + h), (0, 255, 255), 3)
+            cv2.putText(context, f"ROI #{classification.roi_id}", (x, max(15, y - 10)),
+                        font, 0.6, (0, 255, 255), 2)
 
-        # Right: Zoomed ROI
-        roi_image = self.classifier.get_roi_image(classification.roi_id)
-        if roi_image is not None:
-            roi_rgb = cv2.cvtColor(roi_image, cv2.COLOR_BGR2RGB)
-            self.ax_roi.imshow(roi_rgb)
-
-        prediction_color = 'green' if classification.orientation == 'table' else 'orange'
-        self.ax_roi.set_title(
-            f'ROI #{classification.roi_id}\n' +
-            f'Type: {classification.diamond_type.upper()}\n' +
-            f'Orientation: {classification.orientation.upper()} ({100*classification.confidence:.1f}% confidence)',
-            fontsize=12, fontweight='bold', color=prediction_color
-        )
-        self.ax_roi.axis('off')
-
-        # Overall title
-        self.fig.suptitle(
-            f'Verifying {self.current_idx + 1}/{len(self.current_result.classifications)} | ' +
-            f'Verified: {len(self.verifications)} | ' +
-            f'Press: y=CORRECT, n=WRONG, s=SKIP, q=QUIT',
-            fontsize=14, fontweight='bold'
-        )
+        canvas[HEADER_HEIGHT:, :context_w] = context
 
-        plt.draw()
+        # Right: Zoomed ROI, fitted to the panel above the prediction text
+        roi_image = self.classifier.get_roi_image(classification.roi_id)
+        panel_h = context_h - 110
+        if roi_image is not None and roi_image.size:
+            fit = min(ROI_PANEL_WIDTH / roi_image.shape[1], panel_h / roi_image.shape[0])
+            roi_view = cv2.resize(roi_image, None, fx=fit, fy=fit,
+                                  interpolation=cv2.INTER_LINEAR if fit > 1 else cv2.INTER_AREA)
+            rh, rw = roi_view.shape[:2]
+            ox = context_w + (ROI_PANEL_WIDTH - rw) // 2
+            canvas[HEADER_HEIGHT:HEADER_HEIGHT + rh, ox:ox + rw] = roi_view
+
+        prediction_color = (0, 200, 0) if classification.orientation == 'table' else (0, 165, 255)
+        text_y = HEADER_HEIGHT + panel_h + 30
+        for line in (f'ROI #{classification.roi_id}',
+                     f'Type: {classification.diamond_type.upper()}',
+                     f'Orientation: {classification.orientation.upper()} ({100*classification.confidence:.1f}% confidence)'):
+            cv2.putText(canvas, line, (context_w + 10, text_y), font, 0.6, prediction_color, 2)
+            text_y += 30
+
+        # Header: progress and controls
+        cv2.putText(canvas,
+                    f'{self.current_image_path.name} | '
+                    f'Verifying {self.current_idx + 1}/{len(self.current_result.classifications)} | '
+                    f'Verified: {len(self.verifications)} | '
+                    f'Press: y=CORRECT, n=WRONG, s=SKIP, q=QUIT',
+                    (10, 28), font, 0.6, (255, 255, 255), 2)
+
+        cv2.imshow(WINDOW_NAME, canvas)
 
     def save_verifications(self, output_file: str):
         """
@@ -259,6 +334,44 @@ class InteractiveVerifier:
         print()
 
 
+def _prefetch_images(image_files: list, verifier: InteractiveVerifier,
+                     prefetched: Queue, stop: threading.Event):
+    """
+    Producer for verify_batch: decode and detect images ahead of the UI
+
+    FastSAM runs once per chunk of DETECT_BATCH_SIZE images, for the images
+    without cached detections. Each (path, image, diamond_rois) is put on the
+    queue in order, followed by None when done, or by the exception if
+    loading or detection failed. DiamondClassifier serializes detection, so
+    this runs alongside classify_image on the UI thread.
+    """
+    try:
+        for start in range(0, len(image_files), DETECT_BATCH_SIZE):
+            chunk = image_files[start:start + DETECT_BATCH_SIZE]
+            images = [cv2.imread(str(image_path)) for image_path in chunk]
+            detections = [verifier._cached_result(image_path) for image_path in chunk]
+
+            # Only images without cached detections go through FastSAM
+            pending = [k for k, (image, rois) in enumerate(zip(images, detections))
+                       if image is not None and rois is None]
+            for k, diamond_rois in zip(pending, verifier.classifier.detect_batch([images[k] for k in pending])):
+                detections[k] = diamond_rois
+                verifier._store_result(chunk[k], diamond_rois)
+
+            for item in zip(chunk, images, detections):
+                if stop.is_set():
+                    return
+                prefetched.put(item)
+    except Exception as e:
+        # Handed to verify_batch, which re-raises it after saving progress
+        if not stop.is_set():
+            prefetched.put(e)
+    else:
+        # After a stop nobody reads the queue, so don't block on it
+        if not stop.is_set():
+            prefetched.put(None)
+
+
 def verify_batch(input_path: str, output_file: str = None):
     """
     Interactively verify classifications in batch
@@ -277,10 +390,7 @@ def verify_batch(input_path: str, output_file: str = None):
     if input_path.is_file():
         image_files = [input_path]
     elif input_path.is_dir():
-        image_extensions = ['.jp2', '.jpg', '.jpeg', '.png']
-        image_files = []
-        for ext in image_extensions:
-            image_files.extend(input_path.glob(f'*{ext}'))
+        image_files = find_images(input_path)
     else:
         print(f"ERROR: Invalid path: {input_path}")
         return
@@ -298,7 +408,7 @@ def verify_batch(input_path: str, output_file: str = None):
         return
 
     classifier = DiamondClassifier(str(model_file), str(feature_file))
-    verifier = InteractiveVerifier(classifier)
+    verifier = InteractiveVerifier(classifier, cache_dir=project_root / 'output' / '.verify_cache')
 
     print("="*80)
     print("BATCH INTERACTIVE VERIFICATION")
@@ -306,12 +416,30 @@ def verify_batch(input_path: str, output_file: str = None):
     print(f"Images to verify: {len(image_files)}")
     print("="*80)
 
-    # Verify each image
-    for img_idx, image_path in enumerate(image_files):
+    # Images are decoded and detected on a background thread, so IO and
+    # FastSAM overlap with the time spent answering in the UI
+    prefetched = Queue(maxsize=PREFETCH_IMAGES)
+    stop = threading.Event()
+    producer = threading.Thread(target=_prefetch_images,
+                                args=(image_files, verifier, prefetched, stop), daemon=True)
+    producer.start()
+
+    prefetch_error = None
+    for img_idx in range(len(image_files)):
+        item = prefetched.get()
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            prefetch_error = item
+            print(f"\nERROR: Could not load or detect the next images: {item}")
+            break
+
+        image_path, image, diamond_rois = item
         print(f"\n--- Image {img_idx + 1}/{len(image_files)} ---")
-        verifier.verify_image(str(image_path))
+        verifier.verify_image(str(image_path), image, diamond_rois)
 
         if verifier.should_quit:
+            stop.set()
             print("\nQuitting verification...")
             break
 
@@ -321,6 +449,9 @@ def verify_batch(input_path: str, output_file: str = None):
 
     verifier.save_verifications(str(output_file))
 
+    if prefetch_error is not None:
+        raise prefetch_error
+
 
 if __name__ == '__main__':
     import argparse